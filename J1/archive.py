@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import mmap
+import os
+import threading
+import uuid
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+import numpy as np
+
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("offset", "<u8"), ("length", "<u8")])
+# Hop-by-hop and encoding headers no longer describe the decoded body we store
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+
+ArchivedResponse = namedtuple("ArchivedResponse", "url status headers body date")
+
+def url_key(url):
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+def _record(url, status, reason, headers, body, compresslevel):
+    head = [f"HTTP/1.1 {status} {reason}".rstrip()]
+    head += [f"{k}: {v}" for k, v in headers.items() if k.lower() not in DROPPED_HEADERS]
+    head.append(f"Content-Length: {len(body)}")
+    payload = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1", "replace") + body
+    warc = (f"WARC/1.0\r\n"
+            f"WARC-Type: response\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"Content-Type: application/http; msgtype=response\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n").encode("utf-8")
+    return gzip.compress(warc + payload + b"\r\n\r\n", compresslevel)
+
+def _parse_headers(lines):
+    return dict(line.split(":", 1) for line in lines if ":" in line)
+
+def parse_record(data):
+    """Decode one gzip member written by WarcArchive.append() into an ArchivedResponse."""
+    data = gzip.decompress(data)
+    head, _, rest = data.partition(b"\r\n\r\n")
+    warc = {k: v.strip() for k, v in _parse_headers(head.decode("utf-8").split("\r\n")[1:]).items()}
+    payload = rest[:int(warc["Content-Length"])]
+    http_head, _, body = payload.partition(b"\r\n\r\n")
+    lines = http_head.decode("latin-1").split("\r\n")
+    headers = {k: v.strip() for k, v in _parse_headers(lines[1:]).items()}
+    return ArchivedResponse(warc["WARC-Target-URI"], int(lines[0].split(" ", 2)[1]), headers, body,
+                            warc.get("WARC-Date"))
+
+def read_record(path, offset, length):
+    """Read the record at `offset` without opening the index, e.g. from a worker process."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return parse_record(os.pread(fd, length, offset))
+    finally:
+        os.close(fd)
+
+def _scan_members(path):
+    """(offset, length, url) of every complete gzip member of an archive, to rebuild a lost index."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = 0
+        while offset < len(data):
+            inflater = zlib.decompressobj(wbits=31)
+            head, pos = b"", offset
+            try:
+                while not inflater.eof and pos < len(data):
+                    chunk = data[pos:pos + 65536]
+                    out = inflater.decompress(chunk)
+                    if len(head) < 4096:
+                        head += out[:4096]
+                    pos += len(chunk)
+            except zlib.error:
+                return  # corrupt tail
+            if not inflater.eof:
+                return  # torn tail
+            end = pos - len(inflater.unused_data)
+            url = next((line.split(b":", 1)[1].strip().decode("utf-8") for line in head.split(b"\r\n")
+                        if line.startswith(b"WARC-Target-URI:")), None)
+            if url is not None:
+                yield offset, end - offset, url
+            offset = end
+
+def _complete(entries, size):
+    """Number of leading index entries whose record fits within an archive of `size` bytes."""
+    valid = entries["offset"] + entries["length"] <= size
+    return int(np.argmin(valid)) if not valid.all() else len(entries)
+
+class WarcArchive:
+    """Append-only archive of fetched pages: a .warc.gz file plus a memory-mapped URL index.
+
+    Every response is its own gzip member, so the file stays a valid
+    .warc.gz for standard WARC tools and any record can be read back on
+    its own. `<path>.idx` holds one fixed-size (URL hash, offset, length)
+    entry per record and is read through np.memmap, so opening a large
+    archive costs nothing and a lookup is one vectorised scan. Bodies are
+    stored decoded, with Content-Encoding dropped. A missing index is
+    rebuilt from the archive on first use, by readers too; entries of a torn
+    tail left by a crash are ignored, and the next append() cuts the tail
+    back to the last complete record.
+    """
+
+    def __init__(self, path="archive.warc.gz", compresslevel=6):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._file = None
+        self._index_file = None
+        self._entries = None
+        self._count = 0
+        self._indexed = False
+
+    def _rebuild_index(self):
+        """Rebuild a missing index by scanning the archive; returns the archive size."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        if size and not index_size:
+            entries = np.array([(url_key(url), offset, length) for offset, length, url in _scan_members(self.path)],
+                               dtype=INDEX_DTYPE)
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(entries.tobytes())
+            os.replace(tmp, self.index_path)
+        return size
+
+    def _recover(self):
+        size = self._rebuild_index()
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        with open(self.index_path, "ab+") as f:
+            f.seek(0)
+            entries = np.frombuffer(f.read(index_size - index_size % INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+            count = _complete(entries, size)
+            f.truncate(count * INDEX_DTYPE.itemsize)
+        end = int(entries[count - 1]["offset"] + entries[count - 1]["length"]) if count else 0
+        if size > end:
+            with open(self.path, "rb+") as f:
+                f.truncate(end)
+
+    def append(self, url, status, headers, body, reason=""):
+        """Append one response; safe to call from many threads."""
+        record = _record(url, status, reason, headers, body, self.compresslevel)
+        with self._lock:
+            if self._file is None:
+                self._recover()
+                self._file = open(self.path, "ab")
+                self._index_file = open(self.index_path, "ab")
+            offset = self._file.tell()
+            self._file.write(record)
+            self._file.flush()
+            entry = np.array([(url_key(url), offset, len(record))], dtype=INDEX_DTYPE)
+            self._index_file.write(entry.tobytes())
+            self._index_file.flush()
+        return len(record)
+
+    def append_response(self, url, response):
+        """Append a requests response under the URL it was requested as."""
+        return self.append(url, response.status_code, response.headers, response.content, response.reason or "")
+
+    def _index(self):
+        # Readers rebuild a lost index too, but leave truncation to the next append()
+        with self._lock:
+            if not self._indexed:
+                self._rebuild_index()
+                self._indexed = True
+        size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        count = size // INDEX_DTYPE.itemsize
+        with self._lock:
+            if self._entries is None or self._count != count:
+                entries = (np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r", shape=(count,))
+                           if count else np.empty(0, dtype=INDEX_DTYPE))
+                # Entries of a torn tail point past the end of the archive
+                self._entries = entries[:_complete(entries, os.path.getsize(self.path) if count else 0)]
+                self._count = count
+            return self._entries
+
+    def __len__(self):
+        return len(self._index())
+
+    def entries(self, latest=True):
+        """Index entries in archive order; with `latest`, only the last capture of each URL."""
+        entries = self._index()
+        if latest and len(entries):
+            _, last = np.unique(entries["key"][::-1], return_index=True)
+            entries = entries[np.sort(len(entries) - 1 - last)]
+        return entries
+
+    def read(self, offset, length):
+        return read_record(self.path, int(offset), int(length))
+
+    def get(self, url):
+        """The latest archived response for `url`, or None."""
+        entries = self._index()
+        for i in np.flatnonzero(entries["key"] == url_key(url))[::-1]:
+            response = self.read(entries[i]["offset"], entries[i]["length"])
+            if response.url == url:
+                return response
+        return None
+
+    def __iter__(self):
+        for entry in self.entries(latest=False):
+            yield self.read(entry["offset"], entry["length"])
+
+    def close(self):
+        with self._lock:
+            for f in (self._file, self._index_file):
+                if f is not None:
+                    f.close()
+            self._file = self._index_file = None
+            self._entries = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
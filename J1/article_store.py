@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.environ.get("SCRAPE_DB", "scrape.sqlite")
+
+# `articles_fts` is an external-content FTS5 index over `articles`, kept in
+# sync by the triggers; the full record is kept as JSON next to the columns
+# that are searched or sorted on.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id          INTEGER PRIMARY KEY,
+    url         TEXT NOT NULL UNIQUE,
+    title       TEXT,
+    author      TEXT,
+    date        TEXT,
+    categories  TEXT,
+    text        TEXT,
+    record      TEXT NOT NULL,
+    scraped_at  TEXT,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_date ON articles(date);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, text, categories, content='articles', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, text, categories) VALUES (new.id, new.title, new.text, new.categories);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, text, categories)
+    VALUES ('delete', old.id, old.title, old.text, old.categories);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, text, categories)
+    VALUES ('delete', old.id, old.title, old.text, old.categories);
+    INSERT INTO articles_fts(rowid, title, text, categories) VALUES (new.id, new.title, new.text, new.categories);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO articles (url, title, author, date, categories, text, record, scraped_at, updated_at)
+VALUES (:url, :title, :author, :date, :categories, :text, :record, :scraped_at, :updated_at)
+ON CONFLICT(url) DO UPDATE SET
+    title = excluded.title, author = excluded.author, date = excluded.date,
+    categories = excluded.categories, text = excluded.text, record = excluded.record,
+    scraped_at = excluded.scraped_at, updated_at = excluded.updated_at
+"""
+
+def connect(path):
+    """Open the shared SQLite file in WAL mode, so readers never block the writer."""
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    try:
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        db.close()
+        raise RuntimeError(f"SQLite {sqlite3.sqlite_version} was built without FTS5")
+    return db
+
+def _row(record):
+    text = record.get("text") or record.get("paragraphs") or ""
+    return {
+        "url": record["url"],
+        "title": record.get("title"),
+        "author": record.get("author"),
+        "date": record.get("date"),
+        "categories": record.get("categories"),
+        "text": text,
+        "record": json.dumps(record, ensure_ascii=False, default=str),
+        "scraped_at": record.get("scraped_at"),
+        "updated_at": time.time(),
+    }
+
+class ArticleStore:
+    """Scraped articles in SQLite, keyed by URL, with a full-text index over title, text and categories."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def upsert(self, records):
+        """Insert or replace many records in one transaction; returns how many were written."""
+        rows = [_row(r) for r in records]
+        with self._lock, self._db:
+            self._db.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM articles")
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT record FROM articles WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, query, limit=20):
+        """Best matches for an FTS5 query, as (url, title, snippet) ranked by bm25."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT a.url, a.title, snippet(articles_fts, 1, '[', ']', '…', 12) "
+                "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ? ORDER BY bm25(articles_fts) LIMIT ?",
+                (query, limit)).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,26 @@
+from batch import run_batch
+from crawl_state import scrape_changed
+from dedup import fingerprinted, filter_duplicates
+from pipeline import run_pipeline
+
+def scrape_articles(urls, columns, scrape, concurrency=8, parse_workers=None, batch_size=16, state=None, min_age=0,
+                    dedup=None, on_drop=None):
+    """Scrape many articles concurrently, yielding (url, data, error) as they finish.
+
+    `scrape(url)` fetches and extracts one article with `columns`; the
+    scraper scripts pass their own. With `parse_workers`, downloads stay on
+    `concurrency` threads and parsing moves to that many processes, in
+    batches of `batch_size` pages. With a CrawlState, only URLs older than
+    `min_age` seconds are fetched and only changed articles are yielded,
+    through the same process pool if `parse_workers` is set. With a
+    NearDuplicateIndex as `dedup`, near-duplicate articles are flagged or
+    dropped; `on_drop(url)` is then called for each dropped one.
+    """
+    fingerprint = None if dedup is None else (dedup.num_perm, dedup.k)
+    if state is not None:
+        results = scrape_changed(urls, columns, state, concurrency, min_age, parse_workers, batch_size, fingerprint)
+    elif parse_workers:
+        results = run_pipeline(urls, columns, concurrency, parse_workers, batch_size, fingerprint)
+    else:
+        results = run_batch(scrape if dedup is None else fingerprinted(scrape, dedup), urls, concurrency)
+    return results if dedup is None else filter_duplicates(results, dedup, on_drop)
@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+def run_batch(func, items, concurrency=8):
+    """Run func over items in a bounded thread pool.
+
+    Yields (item, result, error) tuples as they finish; a failing item never
+    stops the batch. At most `concurrency` items are in flight, so `items`
+    can be a lazy iterator of any length.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {pool.submit(func, item): item for item in islice(items, concurrency)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+                for nxt in islice(items, 1):
+                    pending[pool.submit(func, nxt)] = nxt
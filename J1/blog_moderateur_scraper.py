@@ -1,54 +1,40 @@
-import requests, pandas as pd
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
 import logging
-from datetime import datetime
+import metrics
+from http_client import fetch, enable_cache, enable_politeness, enable_archive
+from extraction import extract_article
+from articles import scrape_articles
+from sinks import open_sink
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def scrape_bdm_article(url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        soup = BeautifulSoup(requests.get(url, headers=headers, timeout=10).text, "lxml")
-
-        title  = (soup.find("h1") or {}).get_text(strip=True)
-        date   = (soup.find("time") or {}).get("datetime", "")
-
-        author_sel  = ["span.byline", "span.author", "[rel='author']", ".author"]
-        author      = next((soup.select_one(s).get_text(strip=True) for s in author_sel if soup.select_one(s)), "")
-
-        byline_sel  = [".article-social-content", ".entry-meta", ".byline", ".post-meta"]
-        byline      = next((soup.select_one(s).get_text(" ", strip=True) for s in byline_sel if soup.select_one(s)), "")
+COLUMNS = ["title", "date", "author", "byline", "meta_description",
+           "text", "paragraph_count", "image_count", "images"]
 
-        entry       = soup.find("div", class_="entry-content") or soup.find("article") or soup.find("main")
-        paragraphs  = [p.get_text(" ", strip=True) for p in entry.find_all("p")] if entry else []
-        images      = [urljoin(url, img.get("src") or img.get("data-src")) for img in entry.find_all("img", src=True)] if entry else []
+def _scrape(url):
+    return extract_article(fetch(url).text, url, COLUMNS)
 
-        meta_desc   = (soup.find("meta", attrs={"name": "description"}) or {}).get("content", "")
-
-        return {
-            "url": url,
-            "title": title,
-            "date": date,
-            "author": author,
-            "byline": byline,
-            "meta_description": meta_desc,
-            "text": "\n\n".join(paragraphs),
-            "paragraph_count": len(paragraphs),
-            "image_count": len(images),
-            "images": "|".join(images),
-            "scraped_at": datetime.now().isoformat()
-        }
+def scrape_bdm_article(url):
+    try:
+        return _scrape(url)
     except Exception as e:
         logger.error(e)
         return None
 
+def scrape_bdm_articles(urls, concurrency=8, **options):
+    """scrape_bdm_article() over many URLs at once; see articles.scrape_articles for the options."""
+    return scrape_articles(urls, COLUMNS, _scrape, concurrency, **options)
+
 def main():
+    metrics.setup_from_env()
+    enable_cache()
+    enable_politeness()
+    enable_archive()
     url = "https://www.blogdumoderateur.com/ai-overviews-nouveaux-reflexes-lecture-transforment-seo/"
     data = scrape_bdm_article(url)
     if data:
-        pd.DataFrame([data]).to_csv("bdm_article.csv", index=False, encoding="utf-8")
+        with open_sink("bdm_article.csv", mode="w") as sink:
+            sink.write(data)
         print("Sauvegardé dans bdm_article.csv")
     else:
         print("Échec du scraping")
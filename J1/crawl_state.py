@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from http_client import fetch
+from batch import run_batch
+from pipeline import run_pipeline
+from extraction import extract_article
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url           TEXT PRIMARY KEY,
+    first_seen    REAL NOT NULL,
+    last_fetched  REAL,
+    last_changed  REAL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_hash  TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_last_fetched ON pages(last_fetched);
+"""
+
+def content_hash(record):
+    """Hash the extracted content of a record, ignoring when it was scraped and private fields such as signatures."""
+    payload = {k: v for k, v in record.items() if k != "scraped_at" and not k.startswith("_")}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CrawlState:
+    """Persistent frontier and content-hash index shared across runs."""
+
+    def __init__(self, path="crawl_state.sqlite"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def add(self, urls):
+        """Put URLs on the frontier; already known URLs are left untouched."""
+        with self._lock:
+            self._db.executemany("INSERT OR IGNORE INTO pages (url, first_seen) VALUES (?, ?)",
+                                 [(u, time.time()) for u in urls])
+            self._db.commit()
+
+    def frontier(self, limit=None):
+        """URLs discovered but never fetched, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url FROM pages WHERE last_fetched IS NULL ORDER BY first_seen LIMIT ?",
+                (-1 if limit is None else limit,)).fetchall()
+        return [r[0] for r in rows]
+
+    def due(self, urls, min_age=0):
+        """Yield the URLs that are new or were last fetched more than `min_age` seconds ago."""
+        cutoff = time.time() - min_age
+        for url in urls:
+            with self._lock:
+                row = self._db.execute("SELECT last_fetched FROM pages WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    self._db.execute("INSERT INTO pages (url, first_seen) VALUES (?, ?)", (url, time.time()))
+                    self._db.commit()
+            if row is None or row[0] is None or row[0] <= cutoff:
+                yield url
+
+    def last_fetched(self, url):
+        """Epoch seconds of the last fetch of a URL, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT last_fetched FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def updated(self, entries, min_age=0):
+        """Yield the URLs of (url, lastmod) pairs that are due, or changed since their last fetch.
+
+        A URL is due if never fetched or fetched more than `min_age` seconds
+        ago; a lastmod newer than the last fetch makes it due regardless. New
+        URLs are added to the frontier.
+        """
+        cutoff = time.time() - min_age
+        for url, lastmod in entries:
+            with self._lock:
+                row = self._db.execute("SELECT last_fetched FROM pages WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    self._db.execute("INSERT INTO pages (url, first_seen) VALUES (?, ?)", (url, time.time()))
+                    self._db.commit()
+            last = row[0] if row else None
+            if last is None or (lastmod is not None and lastmod > last) or (min_age and last <= cutoff):
+                yield url
+
+    def validators(self, url):
+        """Conditional request headers from the last fetch of a URL."""
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def known_hash(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def record_fetch(self, url, headers, digest=None):
+        """Store a fetch's validators and, if given, the new content hash."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO pages (url, first_seen, last_fetched, etag, last_modified) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET last_fetched = excluded.last_fetched,
+                       etag = COALESCE(excluded.etag, etag),
+                       last_modified = COALESCE(excluded.last_modified, last_modified)""",
+                (url, now, now, headers.get("ETag"), headers.get("Last-Modified")))
+            if digest is not None:
+                self._db.execute("UPDATE pages SET content_hash = ?, last_changed = ? WHERE url = ?",
+                                 (digest, now, url))
+            self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+def scrape_changed(urls, columns, state, concurrency=8, min_age=0, parse_workers=None, batch_size=16,
+                   fingerprint=None):
+    """Scrape only due URLs and yield only the records whose content changed.
+
+    Unchanged pages are recognised either by a 304 on the stored validators or
+    by an identical content hash. A URL's state is committed only after its
+    record has been consumed, so an interrupted run does not lose changes.
+    With `parse_workers`, pages are parsed by run_pipeline()'s process pool,
+    in batches of `batch_size`, and fingerprinted there if `fingerprint` is
+    given.
+    """
+    headers = {}
+
+    def download(url):
+        response = fetch(url, headers=state.validators(url))
+        headers[url] = response.headers
+        if response.status_code == 304:
+            return None
+        return response.content, response.encoding or response.apparent_encoding
+
+    def scrape(url):
+        page = download(url)
+        return None if page is None else extract_article(page[0], url, columns, page[1])
+
+    due = state.due(urls, min_age)
+    if parse_workers:
+        results = run_pipeline(due, columns, concurrency, parse_workers, batch_size, fingerprint, download)
+    else:
+        results = run_batch(scrape, due, concurrency)
+    for url, record, error in results:
+        response_headers = headers.pop(url, {})
+        if error:
+            yield url, None, error
+            continue
+        digest = None
+        if record is not None:
+            digest = content_hash(record)
+            if digest == state.known_hash(url):
+                digest = None
+            else:
+                yield url, record, None
+        state.record_fetch(url, response_headers, digest)
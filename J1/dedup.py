@@ -0,0 +1,201 @@
+import logging
+import os
+import re
+import threading
+import zlib
+import numpy as np
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+PERM_CHUNK = 16
+SIGNATURE_FIELD = "_minhash"
+# Added to flagged records by filter_duplicates()
+DUPLICATE_FIELDS = ["duplicate_of", "similarity"]
+
+def shingles(text, k=5):
+    """Distinct 32-bit hashes of the k-word shingles of a text."""
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    ids = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+    k = min(k, len(ids))
+    n = len(ids) - k + 1
+    hashes = ids[:n].copy()
+    for j in range(1, k):
+        hashes = (hashes * np.uint64(1000003) + ids[j:n + j]) & np.uint64(0xFFFFFFFF)
+    return np.unique(hashes)
+
+def _permutations(num_perm, seed):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+def minhash(texts, num_perm=128, k=5, seed=1):
+    """MinHash signatures of many texts at once, as a (len(texts), num_perm) uint32 array.
+
+    Each permutation is a multiply-shift hash, (a*x + b) >> 32 on 64-bit
+    words. The shingles of the whole batch go through PERM_CHUNK permutations
+    per array operation (small enough to stay in cache), and
+    np.minimum.reduceat takes each text's minimum. Texts without any word
+    get an all-zero row, which never matches.
+    """
+    a, b = _permutations(num_perm, seed)
+    sets = [shingles(t or "", k) for t in texts]
+    signatures = np.zeros((len(texts), num_perm), dtype=np.uint32)
+    present = [i for i, s in enumerate(sets) if len(s)]
+    if present:
+        flat = np.concatenate([sets[i] for i in present])[None, :]
+        offsets = np.cumsum([0] + [len(sets[i]) for i in present[:-1]])
+        mins = np.empty((num_perm, len(present)), dtype=np.uint64)
+        for i in range(0, num_perm, PERM_CHUNK):
+            hashed = a[i:i + PERM_CHUNK] * flat
+            hashed += b[i:i + PERM_CHUNK]
+            hashed >>= np.uint64(32)
+            mins[i:i + PERM_CHUNK] = np.minimum.reduceat(hashed, offsets, axis=1)
+        signatures[present] = mins.T
+    return signatures
+
+def _bands(threshold, num_perm):
+    """The banding whose LSH threshold (1/b)^(1/r) is the highest one not above `threshold`."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda br: (1 / br[0]) ** (1 / br[1])) if below else options[-1]
+
+class NearDuplicateIndex:
+    """LSH index over MinHash signatures, answering "have we seen a near-copy of this text?".
+
+    A signature is split into b bands of r rows; texts sharing any band are
+    candidates, and a candidate is a duplicate if the share of equal
+    signature values (an estimate of the shingle Jaccard similarity) is at
+    least `threshold`. Lookups touch b buckets, not the whole corpus.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, k=5, suppress=False):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.k = k
+        self.suppress = suppress
+        self.bands, self.rows = _bands(threshold, num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._keys = []
+        self._positions = {}
+        self._signatures = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def signatures(self, texts):
+        return minhash(texts, self.num_perm, self.k)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _query(self, signature, bands, exclude=None):
+        candidates = set()
+        for bucket, key in zip(self._buckets, bands):
+            candidates.update(bucket.get(key, ()))
+        candidates.discard(self._positions.get(exclude))
+        best = None
+        for i in candidates:
+            similarity = float(np.mean(self._signatures[i] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self._keys[i], similarity)
+        return best
+
+    def query(self, signature, key=None):
+        """(key, similarity) of the closest indexed near-duplicate other than `key`, or None."""
+        if not signature.any():
+            return None
+        with self._lock:
+            return self._query(signature, self._band_keys(signature), exclude=key)
+
+    def check(self, key, signature):
+        """query(), then index the signature under `key` unless it is a near-duplicate.
+
+        A key already in the index is never its own duplicate: a re-scraped
+        page replaces its previous signature.
+        """
+        if not signature.any():
+            return None
+        bands = self._band_keys(signature)
+        with self._lock:
+            match = self._query(signature, bands, exclude=key)
+            if match is None:
+                i = self._positions.get(key)
+                if i is None:
+                    i = self._positions[key] = len(self._keys)
+                    self._keys.append(key)
+                    self._signatures.append(signature)
+                else:
+                    for bucket, band in zip(self._buckets, self._band_keys(self._signatures[i])):
+                        bucket[band].remove(i)
+                        if not bucket[band]:
+                            del bucket[band]
+                    self._signatures[i] = signature
+                for bucket, band in zip(self._buckets, bands):
+                    bucket.setdefault(band, []).append(i)
+        return match
+
+    def save(self, path):
+        with self._lock:
+            signatures = np.array(self._signatures, dtype=np.uint32).reshape(-1, self.num_perm)
+            keys = np.array(self._keys, dtype=str)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, keys=keys, signatures=signatures,
+                            params=np.array([self.threshold, self.num_perm, self.k]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, suppress=False):
+        with np.load(path) as data:
+            threshold, num_perm, k = data["params"]
+            index = cls(float(threshold), int(num_perm), int(k), suppress)
+            for key, signature in zip(data["keys"], data["signatures"]):
+                index.check(str(key), signature)
+        return index
+
+def record_text(record):
+    return record.get("text") or record.get("paragraphs") or ""
+
+def add_signatures(records, num_perm=128, k=5):
+    """Attach a MinHash signature to each record, hashing the whole batch together."""
+    records = [r for r in records if r is not None]
+    for record, signature in zip(records, minhash([record_text(r) for r in records], num_perm, k)):
+        record[SIGNATURE_FIELD] = signature
+
+def fingerprinted(scrape, index):
+    """Wrap a url -> record function so the record leaves it with its signature attached."""
+    def wrapper(url):
+        record = scrape(url)
+        if record is not None:
+            record[SIGNATURE_FIELD] = index.signatures([record_text(record)])[0]
+        return record
+    return wrapper
+
+def filter_duplicates(results, index, on_drop=None):
+    """Pass (url, record, error) results through `index`.
+
+    Near-duplicates get `duplicate_of` and `similarity` fields, or are
+    dropped when the index was built with suppress=True, after a call to
+    `on_drop(url)` so the caller can forget the URL. Records that were
+    not fingerprinted at extraction time are hashed here.
+    """
+    for url, record, error in results:
+        if record is not None:
+            signature = record.pop(SIGNATURE_FIELD, None)
+            if signature is None:
+                signature = index.signatures([record_text(record)])[0]
+            match = index.check(url, signature)
+            if match is not None:
+                metrics.inc("near_duplicates_total", action="suppressed" if index.suppress else "flagged")
+                logger.info(f"{url} is a near-duplicate of {match[0]} ({match[1]:.0%})")
+                if index.suppress:
+                    if on_drop is not None:
+                        on_drop(url)
+                    continue
+                record["duplicate_of"], record["similarity"] = match[0], round(match[1], 3)
+        yield url, record, error
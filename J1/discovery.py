@@ -0,0 +1,150 @@
+import email.utils
+import gzip
+import io
+import logging
+from datetime import datetime, timezone
+from lxml import etree
+import metrics
+from http_client import fetch
+
+logger = logging.getLogger(__name__)
+
+# Element local name -> (kind, child holding the URL, children holding the date, best first)
+ENTRIES = {
+    "sitemap": ("sitemap", "loc", ("lastmod",)),
+    "url": ("page", "loc", ("lastmod",)),
+    "item": ("page", "link", ("updated", "modified", "pubDate", "date")),
+    "entry": ("page", "link", ("updated", "published")),
+}
+
+def parse_date(text):
+    """Epoch seconds of a W3C (sitemaps, Atom) or RFC 822 (RSS) date, or None."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = email.utils.parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def _localname(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+def _link(child):
+    # Atom: <link rel="alternate" href="..."/>; RSS and sitemaps: <link>/<loc> text
+    if child.get("href") is not None:
+        return child.get("href") if child.get("rel", "alternate") == "alternate" else None
+    return (child.text or "").strip() or None
+
+def iter_entries(source):
+    """Yield (kind, url, lastmod) from a sitemap, sitemap index, RSS or Atom document.
+
+    `source` is a file object. kind is "sitemap" for the children of a
+    sitemap index and "page" otherwise; lastmod is epoch seconds or None.
+    The document is parsed with iterparse and every entry is freed once
+    read, so memory does not grow with the document.
+    """
+    parser = etree.iterparse(source, events=("end",), resolve_entities=False, no_network=True,
+                             huge_tree=True, recover=True)
+    for _, elem in parser:
+        spec = ENTRIES.get(_localname(elem.tag))
+        if spec is None:
+            continue
+        kind, link_name, date_names = spec
+        url, dates = None, {}
+        for child in elem:
+            name = _localname(child.tag)
+            if name == link_name and url is None:
+                url = _link(child)
+            elif name in date_names:
+                dates[name] = child.text
+        lastmod = next((parse_date(dates[n]) for n in date_names if n in dates), None)
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+        if url:
+            yield kind, url, lastmod
+
+def _open(content):
+    # Sitemaps are often served as .xml.gz without a Content-Encoding header
+    source = io.BytesIO(content)
+    return gzip.GzipFile(fileobj=source) if content[:2] == b"\x1f\x8b" else source
+
+def read_entries(url, state=None, read=None):
+    """Fetch one sitemap or feed and yield its (kind, url, lastmod) entries.
+
+    With a CrawlState the request is conditional on the last read and a 304
+    yields nothing. Once every entry was consumed, (url, headers) is added
+    to the `read` list, for discover() to record.
+    """
+    with metrics.timer("scrape_stage_seconds", stage="discover_fetch"):
+        response = fetch(url, headers=state.validators(url) if state is not None else None)
+    if response.status_code == 304:
+        metrics.inc("discovery_documents_total", result="unchanged")
+        return
+    metrics.inc("discovery_documents_total", result="read")
+    metrics.inc("discovery_bytes_total", len(response.content))
+    yield from iter_entries(_open(response.content))
+    if read is not None:
+        read.append((url, response.headers))
+
+def discover(sources, state=None):
+    """Yield (url, lastmod) for every page listed by `sources`, following sitemap indexes.
+
+    Each page is yielded once, after every source was read, with the latest
+    date of all its listings: an RSS pubDate only dates the publication,
+    while the sitemap lastmod of the same page also follows later edits.
+    With a CrawlState, child sitemaps whose lastmod is not newer than their
+    last read are skipped. Every listed URL is put on the state's frontier
+    before the documents are recorded as read, so a run killed before it
+    scraped them retries them from the frontier.
+    """
+    lastmods = {}
+    read = []
+    pending = list(dict.fromkeys(sources))
+    queued = set(pending)
+    while pending:
+        source = pending.pop(0)
+        try:
+            for kind, url, lastmod in read_entries(source, state, read):
+                if kind == "sitemap":
+                    if url in queued:
+                        continue
+                    last_read = state.last_fetched(url) if state is not None else None
+                    if lastmod is None or last_read is None or lastmod > last_read:
+                        pending.append(url)
+                        queued.add(url)
+                    else:
+                        metrics.inc("discovery_documents_total", result="skipped")
+                elif url not in lastmods or (lastmod or 0) > (lastmods[url] or 0):
+                    lastmods[url] = lastmod
+        except Exception as e:
+            logger.error(f"Discovery source {source} failed: {e}")
+    if state is not None:
+        state.add(lastmods.keys())
+        for url, headers in read:
+            state.record_fetch(url, headers)
+    yield from lastmods.items()
+
+def discover_updated(sources, state):
+    """URLs from `sources` that are new, or whose lastmod is after their last fetch in `state`.
+
+    The frontier comes last: URLs discovered by an earlier run but never
+    fetched (their fetch failed, or the run was interrupted) are retried
+    even if the sitemap listing them is now skipped as unchanged.
+    """
+    queued = set()
+    for url in state.updated(discover(sources, state)):
+        queued.add(url)
+        metrics.inc("discovery_urls_total", source="listing")
+        yield url
+    for url in state.frontier():
+        if url not in queued:
+            metrics.inc("discovery_urls_total", source="frontier")
+            yield url
@@ -0,0 +1,111 @@
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import urljoin
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+import metrics
+
+# A field is the first selector (in priority order) that matches, read with
+# `read`; `many` fields keep every match of that selector, `scope` says
+# whether they are looked up in the whole document or in the article body.
+Field = namedtuple("Field", "selectors read many scope")
+
+ENTRY_SELECTORS = ["div.entry-content", "article", "main"]
+
+ARTICLE_FIELDS = {
+    "title":            Field(["h1"], "text", False, "doc"),
+    "date":             Field(["time"], "@datetime", False, "doc"),
+    "author":           Field(["span.byline", "span.author", "[rel='author']", ".author"], "text", False, "doc"),
+    "byline":           Field([".article-social-content", ".entry-meta", ".byline", ".post-meta"], "spaced", False, "doc"),
+    "meta_description": Field(["meta[name='description']"], "@content", False, "doc"),
+    "categories":       Field([".post-categories a", ".entry-categories a", ".tags a", ".category a"], "text", True, "doc"),
+    "paragraphs":       Field(["p"], "spaced", True, "entry"),
+    "list_items":       Field(["li"], "spaced", True, "entry"),
+    "images":           Field(["img[src], img[data-src], img[data-lazy-src]"], "image", True, "entry"),
+}
+
+# Output column -> (field it is built from, how to build it).
+COLUMNS = {
+    "title":            ("title", None),
+    "date":             ("date", None),
+    "author":           ("author", None),
+    "byline":           ("byline", None),
+    "meta_description": ("meta_description", None),
+    "categories":       ("categories", "|".join),
+    "text":             ("paragraphs", "\n\n".join),
+    "paragraphs":       ("paragraphs", "\n\n".join),
+    "paragraph_count":  ("paragraphs", len),
+    "list_items":       ("list_items", "|".join),
+    "list_item_count":  ("list_items", len),
+    "image_count":      ("images", len),
+    "images":           ("images", "|".join),
+}
+
+_TEXT = etree.XPath("descendant::text()[not(parent::script or parent::style)]", smart_strings=False)
+
+def _compile(selectors):
+    return [CSSSelector(sel) for sel in selectors]
+
+_ENTRY = _compile(ENTRY_SELECTORS)
+_COMPILED = {name: (_compile(f.selectors), f) for name, f in ARTICLE_FIELDS.items()}
+
+def _text(el, sep=""):
+    return sep.join(s for s in (t.strip() for t in _TEXT(el)) if s)
+
+def _read(el, read, url):
+    if read == "text":
+        return _text(el)
+    if read == "spaced":
+        return _text(el, " ")
+    if read == "image":
+        # Lazy-loaded images keep the real URL in data-src and a data: placeholder in src
+        for attr in ("data-src", "data-lazy-src", "src"):
+            value = (el.get(attr) or "").strip()
+            if value and not value.startswith("data:"):
+                return urljoin(url, value)
+        return None
+    return el.get(read[1:], "")
+
+def parse_html(content, encoding=None):
+    """Parse a page given as text or raw bytes into an lxml document."""
+    if isinstance(content, str):
+        try:
+            return lxml.html.document_fromstring(content)
+        except ValueError:
+            content, encoding = content.encode("utf-8"), "utf-8"
+    parser = lxml.html.HTMLParser(encoding=encoding) if encoding else None
+    return lxml.html.document_fromstring(content, parser=parser)
+
+def extract_fields(doc, url, names=None):
+    """Evaluate the compiled field spec over one parsed document."""
+    entry = next((m[0] for m in (sel(doc) for sel in _ENTRY) if m), None)
+    fields = {}
+    for name in names or ARTICLE_FIELDS:
+        selectors, field = _COMPILED[name]
+        root = doc if field.scope == "doc" else entry
+        matches = []
+        if root is not None:
+            for sel in selectors:
+                matches = sel(root)
+                if matches:
+                    break
+        if field.many:
+            fields[name] = [v for v in (_read(el, field.read, url) for el in matches) if v is not None]
+        else:
+            fields[name] = (_read(matches[0], field.read, url) if matches else "") or ""
+    return fields
+
+def extract_article(content, url, columns, encoding=None):
+    """Build an article record with the given columns from one page."""
+    with metrics.timer("scrape_stage_seconds", stage="parse"):
+        doc = parse_html(content, encoding)
+    names = {COLUMNS[c][0] for c in columns}
+    with metrics.timer("scrape_stage_seconds", stage="extract"):
+        fields = extract_fields(doc, url, [n for n in ARTICLE_FIELDS if n in names])
+    record = {"url": url}
+    for column in columns:
+        name, build = COLUMNS[column]
+        record[column] = build(fields[name]) if build else fields[name]
+    record["scraped_at"] = datetime.now().isoformat()
+    return record
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url           TEXT PRIMARY KEY,
+    key           TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    max_age       REAL,
+    headers       TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    stored_at     REAL NOT NULL,
+    last_access   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access);
+"""
+
+def _max_age(headers):
+    cache_control = headers.get("Cache-Control", "")
+    if "no-cache" in cache_control:
+        return 0.0
+    m = re.search(r"max-age=(\d+)", cache_control)
+    return float(m.group(1)) if m else None
+
+class HttpCache:
+    """Persistent response cache keyed by URL, with validators and LRU eviction.
+
+    Bodies live in one file each under `directory`, metadata in a SQLite index
+    next to them. `ttl` overrides the server's max-age: within it an entry is
+    served without touching the network, after it the entry is revalidated.
+    """
+
+    def __init__(self, directory=".http_cache", max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def lookup(self, url):
+        """Return the index entry for a URL, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, etag, last_modified, max_age, headers, stored_at FROM entries WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        key, etag, last_modified, max_age, headers, stored_at = row
+        return {"url": url, "key": key, "etag": etag, "last_modified": last_modified,
+                "max_age": max_age, "headers": json.loads(headers), "stored_at": stored_at}
+
+    def is_fresh(self, entry):
+        lifetime = self.ttl if self.ttl is not None else entry["max_age"]
+        return lifetime is not None and time.time() - entry["stored_at"] < lifetime
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, entry):
+        """Read a cached body and mark the entry as recently used."""
+        try:
+            with open(self._path(entry["key"]), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.delete(entry["url"])
+            return None
+        with self._lock:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), entry["url"]))
+            self._db.commit()
+        return body
+
+    def refresh(self, entry, headers):
+        """Restart an entry's freshness lifetime after a 304."""
+        max_age = _max_age(headers)
+        with self._lock:
+            self._db.execute("UPDATE entries SET stored_at = ?, max_age = COALESCE(?, max_age) WHERE url = ?",
+                             (time.time(), max_age, entry["url"]))
+            self._db.commit()
+
+    def store(self, url, headers, body):
+        """Write a body atomically and index it, evicting old entries past the size cap."""
+        if "no-store" in headers.get("Cache-Control", ""):
+            return
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        kept = {k: v for k, v in headers.items() if k.lower() in ("content-type", "etag", "last-modified", "cache-control")}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, key, headers.get("ETag"), headers.get("Last-Modified"), _max_age(headers),
+                 json.dumps(kept), len(body), now, now))
+            self._db.commit()
+        self._evict()
+
+    def delete(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT key FROM entries WHERE url = ?", (url,)).fetchone()
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+        if row:
+            try:
+                os.remove(self._path(row[0]))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for url, key, size in self._db.execute("SELECT url, key, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((url, key))
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE url = ?", [(u,) for u, _ in victims])
+            self._db.commit()
+        for _, key in victims:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
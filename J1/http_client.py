@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import metrics
+from http_cache import HttpCache, DEFAULT_MAX_BYTES
+from politeness import Politeness
+from archive import WarcArchive
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+POOL_SIZE = 32
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_politeness = None
+_archive = None
+
+# New connections are timed (DNS lookup + TCP connect) by hooking urllib3's
+# connection classes; reused keep-alive connections cost nothing here.
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        with metrics.timer("http_connect_seconds", scheme="http"):
+            return super()._new_conn()
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        with metrics.timer("http_connect_seconds", scheme="https"):
+            return super()._new_conn()
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = _TimedAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+def enable_cache(directory=".http_cache", max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+    """Route every fetch() through a persistent on-disk response cache."""
+    global _cache
+    _cache = HttpCache(directory, max_bytes=max_bytes, ttl=ttl)
+    return _cache
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+def enable_politeness(**options):
+    """Send every network request through a per-host Politeness scheduler (see politeness.py)."""
+    global _politeness
+    _politeness = Politeness(get_session(), **options)
+    return _politeness
+
+def disable_politeness():
+    global _politeness
+    _politeness = None
+
+def enable_archive(path=None):
+    """Append every page fetch() downloads to a WARC archive (see archive.py).
+
+    `path` defaults to $SCRAPE_ARCHIVE; without either, archiving stays off.
+    """
+    global _archive
+    path = path or os.environ.get("SCRAPE_ARCHIVE")
+    if path:
+        disable_archive()
+        _archive = WarcArchive(path)
+    return _archive
+
+def disable_archive():
+    global _archive
+    if _archive is not None:
+        _archive.close()
+    _archive = None
+
+def _get(url, headers, timeout):
+    start = time.perf_counter()
+    if _politeness is not None:
+        response = _politeness.get(url, headers=headers, timeout=timeout)
+    else:
+        response = get_session().get(url, headers=headers, timeout=timeout)
+    # `elapsed` stops when the headers are parsed; the rest is the body download
+    total = time.perf_counter() - start
+    metrics.observe("http_ttfb_seconds", response.elapsed.total_seconds())
+    metrics.observe("http_download_seconds", max(0.0, total - response.elapsed.total_seconds()))
+    metrics.observe("http_request_seconds", total)
+    metrics.inc("http_responses_total", status=response.status_code)
+    metrics.inc("http_received_bytes_total", len(response.content))
+    return response
+
+def open_stream(url, headers=None, timeout=10):
+    """GET a URL without reading the body, for large downloads; close the response when done.
+
+    Goes through the politeness scheduler like fetch(), but bypasses the cache.
+    """
+    getter = _politeness.get if _politeness is not None else get_session().get
+    response = getter(url, headers=headers, timeout=timeout, stream=True)
+    metrics.observe("http_ttfb_seconds", response.elapsed.total_seconds())
+    metrics.inc("http_responses_total", status=response.status_code)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    return response
+
+def _cached_response(url, entry, body):
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = body
+    response.from_cache = True
+    return response
+
+def fetch(url, headers=None, timeout=10, use_cache=True):
+    """GET a URL through the pooled session and raise on HTTP errors.
+
+    When the cache is enabled, fresh entries are served from disk and stale
+    ones are revalidated with If-None-Match/If-Modified-Since; a 304 reuses
+    the cached body. Cache hits never reach the politeness scheduler. With
+    enable_archive(), every page downloaded here is also appended to the archive.
+    """
+    cache = _cache if use_cache else None
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        body = cache.load(entry)
+        if body is not None:
+            metrics.inc("http_cache_total", result="hit")
+            return _cached_response(url, entry, body)
+        entry = None
+
+    request_headers = dict(headers or {})
+    if entry:
+        request_headers.update(cache.conditional_headers(entry))
+    response = _get(url, request_headers, timeout)
+
+    if entry and response.status_code == 304:
+        body = cache.load(entry)
+        if body is not None:
+            cache.refresh(entry, response.headers)
+            metrics.inc("http_cache_total", result="revalidated")
+            return _cached_response(url, entry, body)
+        response = _get(url, headers, timeout)
+
+    if cache:
+        metrics.inc("http_cache_total", result="miss")
+    response.raise_for_status()
+    response.from_cache = False
+    if cache and response.status_code == 200:
+        cache.store(url, response.headers, response.content)
+    if _archive is not None and response.status_code == 200:
+        with metrics.timer("scrape_stage_seconds", stage="archive"):
+            metrics.inc("archive_bytes_total", _archive.append_response(url, response))
+    return response
@@ -0,0 +1,188 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import queue
+import tempfile
+import threading
+from urllib.parse import urlsplit
+import metrics
+from http_client import open_stream, enable_politeness
+from batch import run_batch
+from sinks import open_sink
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_DONE = object()
+MANIFEST_FIELDS = ["article", "image", "sha256", "path", "bytes", "content_type", "error"]
+
+def _extension(url, content_type):
+    ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) if content_type else None
+    ext = ext or os.path.splitext(urlsplit(url).path)[1].lower()
+    return {".jpe": ".jpg", ".jpeg": ".jpg"}.get(ext, ext) if len(ext) <= 6 else ""
+
+def download_image(url, directory, timeout=30):
+    """Stream one image to `directory`/<sha256[:2]>/<sha256><ext>; identical bytes are stored once."""
+    with metrics.timer("scrape_stage_seconds", stage="image"):
+        response = open_stream(url, timeout=timeout)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".download-")
+        try:
+            with response, os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha = digest.hexdigest()
+            content_type = response.headers.get("Content-Type", "")
+            path = os.path.join(directory, sha[:2], sha + _extension(url, content_type))
+            if os.path.exists(path):
+                os.remove(tmp)
+                metrics.inc("images_total", result="duplicate")
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+                metrics.inc("images_total", result="stored")
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    metrics.inc("image_bytes_total", size)
+    return {"sha256": sha, "path": os.path.relpath(path, directory), "bytes": size, "content_type": content_type}
+
+def _image_urls(record):
+    images = record.get("images") or []
+    if isinstance(images, str):
+        images = images.split("|")
+    return [u for u in images if u and not u.startswith("data:")]
+
+def _read_manifest(manifest):
+    """Stored files by image URL, and the (article, image) pairs already recorded, from an existing manifest."""
+    images, pairs = {}, set()
+    if not os.path.exists(manifest):
+        return images, pairs
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not entry.get("error") and entry.get("sha256"):
+                images[entry["image"]] = {k: entry[k] for k in ("sha256", "path", "bytes", "content_type")}
+                pairs.add((entry["article"], entry["image"]))
+    return images, pairs
+
+def download_images(records, directory="images", manifest="images_manifest.jsonl", concurrency=8):
+    """Download the images referenced by scraped article records and append the article -> image manifest.
+
+    Each distinct image URL is fetched once, concurrently, and streamed to a
+    content-addressed path. `records` is read lazily, so it can be fed while
+    a crawl runs (see ImageDownloads), and each manifest line is written as
+    soon as its image is settled. Images and pairs already in the manifest
+    are skipped, so a rerun only fetches what is new or failed before.
+    Returns (images downloaded, manifest lines written, errors).
+    """
+    os.makedirs(directory, exist_ok=True)
+    stored, recorded = _read_manifest(manifest)
+    failures = {}
+    waiting = {}  # image URL in flight -> articles to record once it is settled
+    downloaded = written = errors = 0
+
+    with open_sink(manifest, MANIFEST_FIELDS) as sink:
+        def record(article, image):
+            nonlocal written
+            sink.write({"article": article, "image": image, **stored.get(image, {}), "error": failures.get(image, "")})
+            written += 1
+
+        def todo():
+            for rec in records:
+                for image in _image_urls(rec):
+                    pair = (rec["url"], image)
+                    if pair in recorded:
+                        continue
+                    recorded.add(pair)
+                    if image in waiting:
+                        waiting[image].append(rec["url"])
+                    elif image in stored or image in failures:
+                        record(*pair)
+                    else:
+                        waiting[image] = [rec["url"]]
+                        yield image
+
+        for url, info, error in run_batch(lambda u: download_image(u, directory), todo(), concurrency):
+            if error:
+                logger.error(f"Image {url} failed: {error}")
+                failures[url] = str(error)
+                errors += 1
+            else:
+                stored[url] = info
+                downloaded += 1
+            for article in waiting.pop(url):
+                record(article, url)
+    return downloaded, written, errors
+
+class ImageDownloads:
+    """Download the images of records submitted during a crawl, on a background thread.
+
+    Records go through a bounded queue, so the crawl blocks rather than
+    piling up work when the downloads fall behind. close() waits for the
+    remaining downloads and returns download_images()'s counts.
+    """
+
+    def __init__(self, directory="images", manifest=None, concurrency=8, queue_size=256):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._result = self._error = None
+        self._thread = threading.Thread(
+            target=self._run, args=(directory, manifest or os.path.join(directory, "manifest.jsonl"), concurrency),
+            daemon=True)
+        self._thread.start()
+
+    def _run(self, directory, manifest, concurrency):
+        records = iter(self._queue.get, _DONE)
+        try:
+            self._result = download_images(records, directory, manifest, concurrency)
+        except Exception as e:
+            self._error = e
+            for _ in records:
+                pass  # keep draining, or submit() would block the crawl on a full queue
+
+    def submit(self, record):
+        """Queue the images of one record ({"url": ..., "images": ...})."""
+        self._queue.put(record)
+
+    def close(self):
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+def _read_records(path):
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the images of scraped articles (CSV or JSONL with url and images columns).")
+    parser.add_argument("articles")
+    parser.add_argument("--dir", default="images")
+    parser.add_argument("--manifest", default=None, help="default: <dir>/manifest.jsonl")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    metrics.setup_from_env()
+    enable_politeness()
+    downloaded, written, errors = download_images(_read_records(args.articles), args.dir,
+                                                  args.manifest or os.path.join(args.dir, "manifest.jsonl"),
+                                                  args.concurrency)
+    print(f"{downloaded} images downloaded, {written} manifest lines, {errors} errors")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
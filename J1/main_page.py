@@ -1,99 +1,129 @@
+import os
+import queue
+import sys
+import threading
 import requests
-import pandas as pd
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from datetime import datetime
 import logging
+import metrics
+from http_client import fetch, enable_cache, enable_politeness, enable_archive
+from sinks import open_sink
+from blog_moderateur_scraper import scrape_bdm_articles
+from images import ImageDownloads
+from dedup import NearDuplicateIndex, DUPLICATE_FIELDS
+from crawl_state import CrawlState
+from discovery import discover_updated
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_DONE = object()
+CRAWL_FIELDS = [
+    "url", "title", "date", "author", "favtag", "entry_header", "excerpt",
+    "byline", "meta_description", "text", "paragraph_count", "image_count",
+    "images", "archive_description", "popular_topics", "scraped_at"
+]
+
+BASE_URL = "https://www.blogdumoderateur.com"
+DEDUP_INDEX = "dedup_index.npz"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; scraper-example/1.0)",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"
+}
+
+def section_page_url(section, page=1):
+    """URL of page N of a section archive (page 1 is the section root)."""
+    url = f"{BASE_URL}/{section.strip('/')}/"
+    return url if page == 1 else f"{url}page/{page}/"
+
+def parse_section_page(soup, url):
+    """Extract the archive description, popular topics and article rows of one listing page."""
+    archive_desc_elem = soup.select_one(".archive-description p")
+    archive_desc = archive_desc_elem.get_text(" ", strip=True) if archive_desc_elem else "No description found"
+    
+    
+    popular_topics_links = soup.select(".popular-topics.pt-4.pb-md-1 a")
+    popular_topics = "|".join(a.get_text(strip=True) for a in popular_topics_links) if popular_topics_links else "No popular topics found"
+    
+    rows = []
+    articles = soup.select("article")
+    
+    logger.info(f"Found {len(articles)} articles")
+    
+    for i, art in enumerate(articles, 1):
+        
+        title_elem = art.select_one(".entry-title")
+        title = title_elem.get_text(" ", strip=True) if title_elem else f"No title - Article {i}"
+        
+        
+        time_el = art.select_one("time")
+        date = ""
+        if time_el:
+            if time_el.has_attr("datetime"):
+                date = time_el["datetime"]
+            else:
+                date = time_el.get_text(strip=True)
+        
+        
+        favtag_elem = art.select_one(".favtag.color-b")
+        favtag = favtag_elem.get_text(strip=True) if favtag_elem else "No tag"
+        
+        
+        header_elem = art.select_one(".entry-header.pt-1")
+        header = header_elem.get_text(" ", strip=True) if header_elem else "No header"
+        
+        
+        excerpt_elem = art.select_one(".entry-excerpt.t-def.t-size-def.pt-1")
+        excerpt = excerpt_elem.get_text(" ", strip=True) if excerpt_elem else "No excerpt"
+        
+        
+        link_el = art.select_one("a")
+        if link_el and link_el.has_attr("href"):
+            link = urljoin(url, link_el["href"])
+        else:
+            link = "No link found"
+        
+        
+        author_elem = art.select_one(".author, .entry-meta .author")
+        author = author_elem.get_text(strip=True) if author_elem else "No author found"
+        
+        rows.append({
+            "title": title,
+            "date": date,
+            "author": author,
+            "favtag": favtag,
+            "entry_header": header,
+            "excerpt": excerpt,
+            "url": link,
+            "archive_description": archive_desc,
+            "popular_topics": popular_topics,
+            "scraped_at": datetime.now().isoformat()
+        })
+        
+        logger.debug(f"Scraped article {i}: {title[:50]}...")
+    
+    return archive_desc, popular_topics, rows
+
 def scrape_bdm_web():
     """Scrape articles from the Web section of Blog du Modérateur."""
     
-    url = "https://www.blogdumoderateur.com/web/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; scraper-example/1.0)",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"
-    }
+    url = section_page_url("web")
     
     try:
         logger.info(f"Fetching Web section: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "lxml")
-        
-        
-        archive_desc_elem = soup.select_one(".archive-description p")
-        archive_desc = archive_desc_elem.get_text(" ", strip=True) if archive_desc_elem else "No description found"
-        
-        
-        popular_topics_links = soup.select(".popular-topics.pt-4.pb-md-1 a")
-        popular_topics = "|".join(a.get_text(strip=True) for a in popular_topics_links) if popular_topics_links else "No popular topics found"
-        
-        rows = []
-        articles = soup.select("article")
-        
-        logger.info(f"Found {len(articles)} articles")
-        
-        for i, art in enumerate(articles, 1):
-            
-            title_elem = art.select_one(".entry-title")
-            title = title_elem.get_text(" ", strip=True) if title_elem else f"No title - Article {i}"
-            
-            
-            time_el = art.select_one("time")
-            date = ""
-            if time_el:
-                if time_el.has_attr("datetime"):
-                    date = time_el["datetime"]
-                else:
-                    date = time_el.get_text(strip=True)
-            
-            
-            favtag_elem = art.select_one(".favtag.color-b")
-            favtag = favtag_elem.get_text(strip=True) if favtag_elem else "No tag"
-            
-            
-            header_elem = art.select_one(".entry-header.pt-1")
-            header = header_elem.get_text(" ", strip=True) if header_elem else "No header"
-            
-            
-            excerpt_elem = art.select_one(".entry-excerpt.t-def.t-size-def.pt-1")
-            excerpt = excerpt_elem.get_text(" ", strip=True) if excerpt_elem else "No excerpt"
-            
-            
-            link_el = art.select_one("a")
-            if link_el and link_el.has_attr("href"):
-                link = urljoin(url, link_el["href"])
-            else:
-                link = "No link found"
-            
-            
-            author_elem = art.select_one(".author, .entry-meta .author")
-            author = author_elem.get_text(strip=True) if author_elem else "No author found"
-            
-            rows.append({
-                "title": title,
-                "date": date,
-                "author": author,
-                "favtag": favtag,
-                "entry_header": header,
-                "excerpt": excerpt,
-                "url": link,
-                "archive_description": archive_desc,
-                "popular_topics": popular_topics,
-                "scraped_at": datetime.now().isoformat()
-            })
-            
-            logger.debug(f"Scraped article {i}: {title[:50]}...")
-        
-        
-        df = pd.DataFrame(rows)
+        response = fetch(url, headers=HEADERS)
+        
+        with metrics.timer("scrape_stage_seconds", stage="parse_listing"):
+            soup = BeautifulSoup(response.text, "lxml")
+            archive_desc, popular_topics, rows = parse_section_page(soup, url)
+        
+        
         output_file = "bdm_web_archive.csv"
-        df.to_csv(output_file, index=False, encoding="utf-8")
+        with open_sink(output_file, mode="w") as sink:
+            sink.write_many(rows)
         
         logger.info(f"Successfully scraped {len(rows)} articles")
         print(f"Web section scraped successfully!")
@@ -102,7 +132,7 @@ def scrape_bdm_web():
         print(f"Popular topics: {popular_topics}")
         print(f"Saved to {output_file}")
         
-        return df
+        return rows
         
     except requests.RequestException as e:
         logger.error(f"Request failed: {e}")
@@ -113,14 +143,196 @@ def scrape_bdm_web():
         print(f"Scraping error: {e}")
         return None
 
+def _produce_listing_rows(section, max_pages, out, stop):
+    """Walk /page/N/ of a section and push each new article row onto `out`."""
+    seen = set()
+    page = 1
+    try:
+        while not stop.is_set() and (max_pages is None or page <= max_pages):
+            url = section_page_url(section, page)
+            try:
+                response = fetch(url, headers=HEADERS)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    logger.info(f"Reached end of {section} archive at page {page}")
+                    break
+                raise
+            with metrics.timer("scrape_stage_seconds", stage="parse_listing"):
+                _, _, rows = parse_section_page(BeautifulSoup(response.text, "lxml"), url)
+            rows = [r for r in rows if r["url"] != "No link found" and r["url"] not in seen]
+            if not rows:
+                break
+            for row in rows:
+                seen.add(row["url"])
+                while not stop.is_set():
+                    try:
+                        out.put(row, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+            page += 1
+    except Exception as e:
+        logger.error(f"Listing crawl of {section} stopped at page {page}: {e}")
+    finally:
+        while True:
+            try:
+                out.put(_DONE, timeout=0.5)
+                break
+            except queue.Full:
+                if stop.is_set():
+                    break
+
+def crawl_bdm_section(section="web", max_pages=None, concurrency=8, queue_size=64, dedup=None):
+    """Crawl every listing page of a section and scrape each linked article.
+
+    A producer thread follows the archive pagination while article workers
+    consume its links through a bounded queue, so listing and article pages
+    download in parallel and memory stays flat. Yields (url, row, error);
+    `row` merges the listing fields with the full article fields. `dedup` is
+    an optional NearDuplicateIndex (see scrape_bdm_articles).
+    """
+    rows = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce_listing_rows,
+                                args=(section, max_pages, rows, stop), daemon=True)
+    producer.start()
+
+    listing = {}
+    def links():
+        for row in iter(rows.get, _DONE):
+            listing[row["url"]] = row
+            yield row["url"]
+
+    try:
+        for url, article, error in scrape_bdm_articles(links(), concurrency, dedup=dedup,
+                                                       on_drop=lambda url: listing.pop(url, None)):
+            row = listing.pop(url)
+            if article:
+                row = {**row, **article}
+            yield url, row, error
+    finally:
+        stop.set()
+
+def crawl_fields(dedup=None):
+    """Output columns of a crawl; with a dedup index, flagged rows also carry duplicate_of and similarity."""
+    return CRAWL_FIELDS + DUPLICATE_FIELDS if dedup is not None else CRAWL_FIELDS
+
+def _write_crawl(results, output_file, fieldnames=CRAWL_FIELDS, images_dir=None, concurrency=8):
+    """Write the rows of (url, row, error) results to a sink; a None row is only logged.
+
+    With `images_dir`, the images of each written row are downloaded while
+    the crawl goes on (see images.ImageDownloads). Returns (rows written,
+    image counts or None).
+    """
+    count = 0
+    images = ImageDownloads(images_dir, concurrency=concurrency) if images_dir else None
+    try:
+        with open_sink(output_file, fieldnames) as sink:
+            for url, row, error in results:
+                if error:
+                    logger.error(f"Article {url} failed: {error}")
+                if row is None:
+                    continue
+                sink.write(row)
+                count += 1
+                if images and row.get("images"):
+                    images.submit({"url": url, "images": row["images"]})
+    finally:
+        image_counts = images.close() if images else None
+    return count, image_counts
+
+def crawl_to_file(section, output_file, max_pages=None, concurrency=8, images_dir=None, dedup=None):
+    """Stream a full section crawl into a CSV, JSONL, Parquet or SQLite sink, one row at a time.
+
+    With `images_dir`, the articles' images are downloaded there during the crawl (see images.py).
+    With a NearDuplicateIndex as `dedup`, near-copies of articles already seen are
+    logged, or skipped if the index suppresses them.
+    """
+    count, image_counts = _write_crawl(crawl_bdm_section(section, max_pages, concurrency, dedup=dedup),
+                                       output_file, crawl_fields(dedup), images_dir, concurrency)
+    print(f"Crawled {count} articles from /{section}/ into {output_file}")
+    if image_counts:
+        downloaded, _, errors = image_counts
+        print(f"Downloaded {downloaded} images into {images_dir} ({errors} errors)")
+    return count
+
+def discovery_sources(section=None):
+    """The feeds and sitemaps listing the site's articles, feeds first.
+
+    The sitemaps cover the whole site, so a section only gets its own feed.
+    """
+    if section:
+        return [f"{BASE_URL}/{section.strip('/')}/feed/"]
+    return [f"{BASE_URL}/feed/", f"{BASE_URL}/sitemap_index.xml"]
+
+def crawl_discovered(output_file, sources, state, concurrency=8, images_dir=None, dedup=None):
+    """Scrape the articles that `sources` list as new or modified since the last crawl recorded in `state`.
+
+    Discovery reads a few kilobytes of feed and sitemap XML instead of the
+    section's HTML listing pages; rows only carry the article fields. URLs
+    left unfetched by an earlier run are retried (see discover_updated).
+    """
+    results = scrape_bdm_articles(discover_updated(sources, state), concurrency, state=state, dedup=dedup)
+    count, image_counts = _write_crawl(
+        ((url, None if error else {"url": url, **article, "scraped_at": datetime.now().isoformat()}, error)
+         for url, article, error in results),
+        output_file, crawl_fields(dedup), images_dir, concurrency)
+    print(f"Scraped {count} new or updated articles into {output_file}")
+    if image_counts:
+        downloaded, _, errors = image_counts
+        print(f"Downloaded {downloaded} images into {images_dir} ({errors} errors)")
+    return count
+
+def open_dedup():
+    """The NearDuplicateIndex of earlier crawls if SCRAPE_DEDUP is flag or suppress, else None."""
+    mode = os.environ.get("SCRAPE_DEDUP")
+    if not mode:
+        return None
+    if os.path.exists(DEDUP_INDEX):
+        return NearDuplicateIndex.load(DEDUP_INDEX, mode == "suppress")
+    return NearDuplicateIndex(suppress=mode == "suppress")
+
 def main():
-    """Main function to run the scraper."""
+    """Main function to run the scraper.
+
+    main_page.py <section> [max_pages] crawls a section's listing pages;
+    main_page.py discover [section] only scrapes what the feeds and sitemaps
+    list as new or updated since the previous run.
+    """
+    metrics.setup_from_env()
+    enable_cache()
+    enable_politeness()
+    enable_archive()
+    if len(sys.argv) > 1:
+        discover = sys.argv[1] == "discover"
+        args = sys.argv[2:] if discover else sys.argv[1:]
+        section = args[0] if args else None
+        name = section.strip('/').replace('/', '_') if section else "discovered"
+        # SCRAPE_DB points the crawl at the shared SQLite store instead of a CSV
+        output = os.environ.get("SCRAPE_DB") or f"bdm_{name}_crawl.csv"
+        images_dir = os.environ.get("SCRAPE_IMAGES")
+        dedup = open_dedup()
+        try:
+            if discover:
+                state = CrawlState()
+                try:
+                    crawl_discovered(output, discovery_sources(section), state, images_dir=images_dir, dedup=dedup)
+                finally:
+                    state.close()
+            else:
+                max_pages = int(args[1]) if len(args) > 1 else None
+                crawl_to_file(section, output, max_pages, images_dir=images_dir, dedup=dedup)
+        finally:
+            if dedup is not None:
+                dedup.save(DEDUP_INDEX)
+        return
     print("Starting Blog du Modérateur Web section scraper...")
     result = scrape_bdm_web()
     
     if result is not None:
         print("\nFirst few articles:")
-        print(result[['title', 'date', 'favtag']].head())
+        for row in result[:5]:
+            print(f"{row['date']}  {row['favtag']:<15}  {row['title']}")
     else:
         print("Scraping failed!")
 
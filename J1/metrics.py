@@ -0,0 +1,246 @@
+"""Process-wide counters and timers, exported as Prometheus text or JSON.
+
+    with metrics.timer("scrape_stage_seconds", stage="parse"):
+        ...
+    metrics.inc("http_responses_total", status="200")
+
+Set SCRAPE_METRICS=<file.prom|file.json> to write the metrics when the
+process exits, SCRAPE_PROFILE=<file.prof> to run the main thread under
+cProfile, and SCRAPE_SAMPLE=<file.folded> to sample the stacks of every
+thread (see setup_from_env).
+"""
+import atexit
+import bisect
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class Registry:
+    """Counters and fixed-bucket histograms keyed by name and labels."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            # A child forked while another thread held the lock would inherit it locked forever
+            ref = weakref.WeakMethod(self._after_fork)
+
+            def after_fork():
+                method = ref()
+                if method is not None:
+                    method()
+
+            os.register_at_fork(after_in_child=after_fork)
+
+    def _after_fork(self):
+        """Start a forked child with a fresh lock and nothing recorded, without touching the inherited lock."""
+        self._lock = threading.Lock()
+        self._counters, self._histograms = {}, {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0, 0.0, [0] * (len(self.buckets) + 1)]
+            hist[0] += 1
+            hist[1] += seconds
+            hist[2][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def drain(self):
+        """Return the raw state and start over, to ship a worker process's metrics to its parent."""
+        with self._lock:
+            state = (self._counters, self._histograms)
+            self._counters, self._histograms = {}, {}
+        return state
+
+    def merge(self, state):
+        """Add the state returned by another registry's drain()."""
+        counters, histograms = state
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (count, total, buckets) in histograms.items():
+                hist = self._histograms.setdefault(key, [0, 0.0, [0] * (len(self.buckets) + 1)])
+                hist[0] += count
+                hist[1] += total
+                hist[2] = [a + b for a, b in zip(hist[2], buckets)]
+
+    def snapshot(self):
+        """Everything recorded so far as plain data, for JSON output."""
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())]
+            timers = [{"name": n, "labels": dict(l), "count": c, "sum_s": round(s, 6),
+                       "mean_ms": round(s / c * 1000, 3) if c else None}
+                      for (n, l), (c, s, _) in sorted(self._histograms.items())]
+        return {"counters": counters, "timers": timers}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """The Prometheus text exposition format (counters and cumulative histograms)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, (c, s, list(b))) for k, (c, s, b) in self._histograms.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (count, total, buckets) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the metrics to `path`: JSON for .json, Prometheus text otherwise."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json() if path.endswith(".json") else self.to_prometheus())
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+snapshot = REGISTRY.snapshot
+to_prometheus = REGISTRY.to_prometheus
+to_json = REGISTRY.to_json
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def profiled(path):
+    """Run the block under cProfile and save the stats to `path` (read them with pstats or snakeviz)."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+class Sampler:
+    """Sample the stack of every thread every `interval` seconds.
+
+    Unlike cProfile it sees the worker threads, at a cost independent of the
+    number of calls. dump() writes one "frame;frame;frame count" line per
+    distinct stack, the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+_started = False
+
+def setup_from_env():
+    """Honour SCRAPE_METRICS, SCRAPE_PROFILE and SCRAPE_SAMPLE for this run; call once from main()."""
+    global _started
+    if _started:
+        return
+    _started = True
+    metrics_path = os.environ.get("SCRAPE_METRICS")
+    if metrics_path:
+        atexit.register(REGISTRY.dump, metrics_path)
+    profile_path = os.environ.get("SCRAPE_PROFILE")
+    if profile_path:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def stop_profiler():
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        atexit.register(stop_profiler)
+    sample_path = os.environ.get("SCRAPE_SAMPLE")
+    if sample_path:
+        sampler = Sampler().start()
+
+        def stop_sampler():
+            sampler.stop()
+            sampler.dump(sample_path)
+        atexit.register(stop_sampler)
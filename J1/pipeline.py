@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import metrics
+from http_client import fetch
+from batch import run_batch
+from extraction import extract_article
+from dedup import add_signatures
+
+def _download(url):
+    response = fetch(url)
+    return response.content, response.encoding or response.apparent_encoding
+
+def _extract_batch(batch, columns, fingerprint=None):
+    results = []
+    for url, content, encoding in batch:
+        try:
+            results.append((url, extract_article(content, url, columns, encoding), None))
+        except Exception as e:
+            results.append((url, None, e))
+    if fingerprint:
+        with metrics.timer("scrape_stage_seconds", stage="fingerprint"):
+            add_signatures([record for _, record, _ in results], *fingerprint)
+    # Timings recorded in this worker process travel back with the results
+    return results, metrics.REGISTRY.drain()
+
+def run_pipeline(urls, columns, fetch_workers=16, parse_workers=None, batch_size=16, fingerprint=None,
+                 download=_download):
+    """Fetch pages in I/O threads and extract them in a process pool.
+
+    Raw bytes are grouped into batches of `batch_size` pages and parsed by
+    `parse_workers` processes (default: one per core), so parsing is not
+    limited by the GIL. With `fingerprint=(num_perm, k)`, each batch also gets
+    its MinHash signatures there (see dedup.py). `download(url)` returns
+    (content, encoding), or None for a page to skip, which is yielded with
+    no record. Yields (url, record, error) as results come in.
+    """
+    parse_workers = parse_workers or os.cpu_count() or 1
+    max_pending = parse_workers * 2
+    # Forked workers start with an empty registry (see metrics.Registry), so drain() only returns their own
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        pending = set()
+        batch = []
+
+        def drain(block):
+            done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                results, worker_metrics = future.result()
+                metrics.REGISTRY.merge(worker_metrics)
+                yield from results
+
+        for url, page, error in run_batch(download, urls, fetch_workers):
+            if error or page is None:
+                yield url, None, error
+                continue
+            batch.append((url, *page))
+            if len(batch) >= batch_size:
+                pending.add(pool.submit(_extract_batch, batch, columns, fingerprint))
+                batch = []
+            yield from drain(block=len(pending) >= max_pending)
+
+        if batch:
+            pending.add(pool.submit(_extract_batch, batch, columns, fingerprint))
+        while pending:
+            yield from drain(block=True)
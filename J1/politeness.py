@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import requests
+
+RETRY_STATUSES = {429, 502, 503, 504}
+ROBOTS_TTL = 24 * 3600
+
+class RobotsDisallowed(requests.RequestException):
+    """The URL is disallowed for our user agent by the host's robots.txt."""
+
+class CircuitOpen(requests.RequestException):
+    """The host failed too often recently; requests fail fast until it cools down."""
+
+class _Host:
+    def __init__(self, name, limit):
+        self.name = name
+        self.cond = threading.Condition()
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.crawl_delay = 0.0
+        self.robots = None
+        self.robots_expires = 0.0
+        self.robots_lock = threading.Lock()
+        self.latency = None
+        self.best_latency = None
+        self.last_decrease = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.probing = False
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    def state(self, now):
+        if self.open_until > now:
+            return "open"
+        return "half-open" if self.failures and self.cooldown else "closed"
+
+class Politeness:
+    """Per-host rate control in front of the HTTP session.
+
+    For every host it keeps a cached robots.txt (whose Crawl-delay spaces the
+    request starts) and a concurrency limit driven by AIMD: each success raises
+    the limit by 1/limit as long as the smoothed latency stays within
+    `latency_factor` of the best seen, and a 429/503 or a timeout halves it.
+    Retryable failures are retried with full-jitter
+    exponential backoff (or the server's Retry-After), and a host that fails
+    `failure_threshold` times in a row is cut off for `cooldown` seconds, then
+    probed with a single request.
+    """
+
+    def __init__(self, session, initial_concurrency=2, min_concurrency=1, max_concurrency=16,
+                 max_retries=4, backoff_base=0.5, backoff_max=30.0, latency_factor=3.0,
+                 failure_threshold=5, cooldown=30.0, respect_robots=True, robots_timeout=5):
+        self.session = session
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latency_factor = latency_factor
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.respect_robots = respect_robots
+        self.robots_timeout = robots_timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, netloc):
+        with self._lock:
+            host = self._hosts.get(netloc)
+            if host is None:
+                host = self._hosts[netloc] = _Host(netloc, self.initial_concurrency)
+            return host
+
+    def _user_agent(self):
+        return self.session.headers.get("User-Agent", "*")
+
+    def _robots(self, url, host):
+        """The parsed robots.txt of the URL's host, fetched at most once per ROBOTS_TTL."""
+        with host.robots_lock:
+            if host.robots is not None and host.robots_expires > time.time():
+                return host.robots
+            parts = urlsplit(url)
+            parser = RobotFileParser(f"{parts.scheme}://{parts.netloc}/robots.txt")
+            ttl = ROBOTS_TTL
+            try:
+                response = self.session.get(parser.url, timeout=self.robots_timeout)
+                if response.status_code in (401, 403):
+                    parser.disallow_all = True
+                elif response.status_code >= 500:
+                    parser.allow_all = True
+                    ttl = 300  # server trouble: try again soon
+                elif response.status_code >= 400:
+                    parser.allow_all = True
+                else:
+                    parser.parse(response.text.splitlines())
+            except requests.RequestException:
+                parser.allow_all = True
+                ttl = 300
+            delay = parser.crawl_delay(self._user_agent())
+            rate = parser.request_rate(self._user_agent())
+            if rate and rate.requests:
+                delay = max(delay or 0, rate.seconds / rate.requests)
+            with host.cond:
+                host.crawl_delay = float(delay or 0)
+            host.robots, host.robots_expires = parser, time.time() + ttl
+            return parser
+
+    def allowed(self, url):
+        if not self.respect_robots:
+            return True
+        return self._robots(url, self._host(urlsplit(url).netloc)).can_fetch(self._user_agent(), url)
+
+    def _acquire(self, host):
+        with host.cond:
+            while True:
+                now = time.monotonic()
+                if host.open_until > time.time():
+                    raise CircuitOpen(f"circuit open for {host.name}, retry in {host.open_until - time.time():.0f}s")
+                half_open = host.failures >= self.failure_threshold
+                if half_open and (host.probing or host.in_flight):
+                    host.cond.wait(0.5)
+                    continue
+                if host.in_flight < int(host.limit) and now >= host.next_start:
+                    host.in_flight += 1
+                    host.requests += 1
+                    host.probing = half_open
+                    host.next_start = now + host.crawl_delay
+                    return
+                host.cond.wait(max(0.005, host.next_start - now) if host.in_flight < int(host.limit) else None)
+
+    def _release(self, host, latency=None, congested=False, failed=False):
+        with host.cond:
+            host.in_flight -= 1
+            host.probing = False
+            now = time.monotonic()
+            healthy = True
+            if latency is not None:
+                host.latency = latency if host.latency is None else 0.8 * host.latency + 0.2 * latency
+                host.best_latency = latency if host.best_latency is None else min(host.best_latency, latency)
+                healthy = host.latency <= self.latency_factor * host.best_latency
+            if congested:
+                host.throttled += 1
+                # At most one cut per round trip, so a burst of failures counts once
+                if now - host.last_decrease >= max(host.latency or 0, 0.1):
+                    host.limit = max(self.min_concurrency, host.limit / 2)
+                    host.last_decrease = now
+            elif latency is not None and healthy:
+                host.limit = min(self.max_concurrency, host.limit + 1 / host.limit)
+            if failed:
+                host.failures += 1
+                if host.failures >= self.failure_threshold:
+                    host.cooldown = min(self.cooldown * 8, host.cooldown * 2) if host.cooldown else self.cooldown
+                    host.open_until = time.time() + host.cooldown
+            else:
+                host.failures = 0
+                host.cooldown = 0.0
+            host.cond.notify_all()
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.strip().isdigit():
+            return min(self.backoff_max, float(retry_after))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, url, **kwargs):
+        """session.get(url, **kwargs) under the host's robots rules, rate limit and retry policy."""
+        host = self._host(urlsplit(url).netloc)
+        if self.respect_robots and not self._robots(url, host).can_fetch(self._user_agent(), url):
+            raise RobotsDisallowed(f"robots.txt disallows {url}")
+        for attempt in range(self.max_retries + 1):
+            self._acquire(host)
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError):
+                self._release(host, congested=True, failed=True)
+                if attempt == self.max_retries:
+                    raise
+                response = None
+            else:
+                if response.status_code in RETRY_STATUSES:
+                    self._release(host, congested=True, failed=True)
+                    if attempt == self.max_retries:
+                        return response
+                    response.close()  # hand a streamed connection back to the pool
+                else:
+                    self._release(host, latency=time.monotonic() - started)
+                    return response
+            with host.cond:
+                host.retries += 1
+            time.sleep(self._backoff(attempt, response))
+
+    def stats(self):
+        """Current limit, latency and counters of every host seen so far."""
+        now = time.time()
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {name: {"limit": round(h.limit, 2), "in_flight": h.in_flight, "crawl_delay": h.crawl_delay,
+                       "latency_ms": None if h.latency is None else round(h.latency * 1000, 1),
+                       "circuit": h.state(now), "requests": h.requests, "throttled": h.throttled,
+                       "retries": h.retries}
+                for name, h in hosts.items()}
@@ -0,0 +1,147 @@
+import argparse
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from bs4 import BeautifulSoup
+import metrics
+from archive import WarcArchive, read_record
+from extraction import extract_article
+from blog_moderateur_scraper import COLUMNS
+from dedup import add_signatures, filter_duplicates
+from main_page import DEDUP_INDEX, crawl_fields, open_dedup, parse_section_page
+from sinks import open_sink
+
+logger = logging.getLogger(__name__)
+
+CHARSET_RE = re.compile(r"charset=[\"']?([\w-]+)", re.I)
+BODY_CLASS_RE = re.compile(rb"<body[^>]*?\sclass=[\"']([^\"']*)", re.I)
+
+def _is_listing(body):
+    # WordPress marks archive pages (sections, tags, pagination) with body.archive
+    m = BODY_CLASS_RE.search(body)
+    classes = m.group(1).split() if m else []
+    return b"archive" in classes or b"blog" in classes
+
+def _read_html(path, offset, length):
+    """The archived response at `offset` and its declared charset, or None if it is not a 200 HTML page."""
+    response = read_record(path, offset, length)
+    if response.status != 200 or "html" not in response.headers.get("Content-Type", "html"):
+        return None
+    m = CHARSET_RE.search(response.headers.get("Content-Type", ""))
+    return response, (m.group(1) if m else None)
+
+def _scan_batch(path, spans):
+    """First pass: listing rows of the listing pages in `spans`, and the spans of the other HTML pages."""
+    rows, articles, errors = [], [], []
+    for offset, length in spans:
+        try:
+            page = _read_html(path, offset, length)
+            if page is None:
+                continue
+            response, encoding = page
+            if not _is_listing(response.body):
+                articles.append((offset, length))
+                continue
+            with metrics.timer("scrape_stage_seconds", stage="reextract_listing"):
+                soup = BeautifulSoup(response.body, "lxml", from_encoding=encoding)
+                rows.extend(parse_section_page(soup, response.url)[2])
+        except Exception as e:
+            errors.append((f"record at {offset}", e))
+    return (rows, articles, errors), metrics.REGISTRY.drain()
+
+def _extract_batch(path, columns, fingerprint, spans):
+    """Second pass: article records of the pages in `spans`, with their MinHash signatures if `fingerprint` is set."""
+    records, errors = [], []
+    for offset, length in spans:
+        try:
+            response, encoding = _read_html(path, offset, length)
+            with metrics.timer("scrape_stage_seconds", stage="reextract"):
+                records.append(extract_article(response.body, response.url, columns, encoding))
+        except Exception as e:
+            errors.append((f"record at {offset}", e))
+    if fingerprint:
+        with metrics.timer("scrape_stage_seconds", stage="fingerprint"):
+            add_signatures(records, *fingerprint)
+    return (records, errors), metrics.REGISTRY.drain()
+
+def _ordered(pool, func, batches, window, *args):
+    """pool.submit(func, *args, batch) for each batch, with at most `window` in flight; results in submission order."""
+    batches = iter(batches)
+    pending = deque(pool.submit(func, *args, batch) for batch in islice(batches, window))
+    while pending:
+        result, worker_metrics = pending.popleft().result()
+        metrics.REGISTRY.merge(worker_metrics)
+        for batch in islice(batches, 1):
+            pending.append(pool.submit(func, *args, batch))
+        yield result
+
+def _chunks(items, size):
+    return (items[i:i + size] for i in range(0, len(items), size))
+
+def reextract(archive_path, output_file, workers=None, batch_size=64, columns=COLUMNS, dedup=None):
+    """Rebuild a crawl output from the archive with the current extractors, without touching the network.
+
+    The latest capture of every URL goes through a process pool twice. The
+    first pass parses the listing pages, which are few, and sorts the
+    other pages out; the second extracts the articles and merges each with
+    the row of the latest listing that linked to it, as in a live crawl,
+    wherever that listing sits in the archive. Listing rows whose article
+    was never archived are written alone at the end. With a
+    NearDuplicateIndex as `dedup`, articles are flagged or dropped as in a
+    live crawl. Returns (rows written, errors).
+    """
+    def failed(errors):
+        for where, error in errors:
+            logger.error(f"Re-extraction of {where} failed: {error}")
+        return len(errors)
+
+    with WarcArchive(archive_path) as archive:
+        entries = archive.entries(latest=True)
+    spans = [(int(e["offset"]), int(e["length"])) for e in entries]
+    workers = workers or os.cpu_count() or 1
+    listing, articles = {}, []
+    written = errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rows, pages, batch_errors in _ordered(pool, _scan_batch, _chunks(spans, batch_size), workers * 2,
+                                                  archive_path):
+            listing.update((row["url"], row) for row in rows if row["url"] != "No link found")
+            articles.extend(pages)
+            errors += failed(batch_errors)
+        fingerprint = None if dedup is None else (dedup.num_perm, dedup.k)
+        with open_sink(output_file, crawl_fields(dedup), mode="w") as sink:
+            for records, batch_errors in _ordered(pool, _extract_batch, _chunks(articles, batch_size), workers * 2,
+                                                  archive_path, columns, fingerprint):
+                results = ((record["url"], record, None) for record in records)
+                if dedup is not None:
+                    results = filter_duplicates(results, dedup, on_drop=lambda url: listing.pop(url, None))
+                for url, record, _ in results:
+                    sink.write({**listing.pop(url, {}), **record})
+                    written += 1
+                errors += failed(batch_errors)
+            for row in listing.values():
+                sink.write(row)
+                written += 1
+    return written, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run the current extractors over an archive of fetched pages, offline.")
+    parser.add_argument("archive", help="a .warc.gz written with SCRAPE_ARCHIVE")
+    parser.add_argument("output", help="CSV, JSONL, Parquet or SQLite output, replaced")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    metrics.setup_from_env()
+    dedup = open_dedup()
+    try:
+        written, errors = reextract(args.archive, args.output, args.workers, args.batch_size, dedup=dedup)
+    finally:
+        if dedup is not None:
+            dedup.save(DEDUP_INDEX)
+    print(f"Re-extracted {written} rows into {args.output} ({errors} errors)")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,232 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+import metrics
+
+class _Sink:
+    """Append records one at a time, flushing to disk every N rows or T seconds."""
+
+    def __init__(self, path, fieldnames=None, flush_every=100, flush_interval=5.0):
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, record):
+        with metrics.timer("scrape_stage_seconds", stage="write"):
+            self._write(record)
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        with metrics.timer("scrape_stage_seconds", stage="flush"):
+            self._flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _FileSink(_Sink):
+    def __init__(self, path, fieldnames=None, mode="a", **kwargs):
+        super().__init__(path, fieldnames, **kwargs)
+        if mode == "a" and os.path.exists(path):
+            self._recover()
+        else:
+            open(path, "wb").close()
+        self._file = open(path, "ab")
+
+    def _recover(self):
+        pass
+
+    def _flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close(self):
+        self._file.close()
+
+class JsonlSink(_FileSink):
+    """One JSON object per line; a torn last line is dropped on reopen."""
+
+    def _recover(self, chunk_size=64 * 1024):
+        # Scan back from the end for the last newline; only a torn tail is read
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - chunk_size)
+                f.seek(start)
+                newline = f.read(pos - start).rfind(b"\n")
+                if newline >= 0:
+                    if start + newline + 1 < end:
+                        f.truncate(start + newline + 1)
+                    return
+                pos = start
+            f.truncate(0)
+
+    def _write(self, record):
+        if self.fieldnames:
+            record = {k: record.get(k, "") for k in self.fieldnames}
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+class CsvSink(_FileSink):
+    """CSV with a header row; rows are written whole and a torn tail is cut on reopen.
+
+    A `.ckpt` file next to the CSV records the last fsynced offset, so
+    recovery only re-reads the rows written after it.
+    """
+
+    def __init__(self, path, fieldnames=None, mode="a", **kwargs):
+        self._ckpt = path + ".ckpt"
+        super().__init__(path, fieldnames, mode, **kwargs)
+        if mode != "a" and os.path.exists(self._ckpt):
+            os.remove(self._ckpt)
+
+    def _recover(self):
+        with open(self.path, "rb+") as f:
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                f.truncate(0)
+                return
+            existing = next(csv.reader([header.decode("utf-8")]))
+            if self.fieldnames is None:
+                self.fieldnames = existing
+            elif existing != self.fieldnames:
+                raise ValueError(f"{self.path} has columns {existing}, expected {self.fieldnames}")
+            start = min(max(f.tell(), self._checkpoint()), os.path.getsize(self.path))
+            f.seek(start)
+            f.truncate(start + _complete_csv_prefix(f.read(), len(existing)))
+
+    def _checkpoint(self):
+        try:
+            with open(self._ckpt) as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write(self, record):
+        if self.fieldnames is None:
+            self.fieldnames = list(record)
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        if self._file.tell() == 0:
+            writer.writerow(self.fieldnames)
+        writer.writerow([record.get(k, "") for k in self.fieldnames])
+        self._file.write(buf.getvalue().encode("utf-8"))
+
+    def _flush(self):
+        super()._flush()
+        tmp = self._ckpt + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(self._file.tell()))
+        os.replace(tmp, self._ckpt)
+
+def _complete_csv_prefix(tail, width):
+    """Length in bytes of the complete CSV rows at the start of `tail`."""
+    lines = [line + b"\n" for line in tail.split(b"\n")]
+    lines[-1] = lines[-1][:-1]
+    consumed = 0
+    good = 0
+
+    def feed():
+        nonlocal consumed
+        for line in lines:
+            consumed += len(line)
+            yield line.decode("utf-8", errors="replace")
+
+    try:
+        for row in csv.reader(feed()):
+            if len(row) == width and tail[:consumed].endswith(b"\n"):
+                good = consumed
+    except csv.Error:
+        pass
+    return good
+
+class ParquetSink(_Sink):
+    """Buffer records into row groups, each written atomically as a part file of a dataset directory."""
+
+    def __init__(self, path, fieldnames=None, mode="a", flush_every=10000, **kwargs):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        super().__init__(path, fieldnames, flush_every=flush_every, **kwargs)
+        self._pa, self._pq = pyarrow, pyarrow.parquet
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(n for n in os.listdir(path) if re.fullmatch(r"part-\d+\.parquet", n))
+        if mode != "a":
+            for name in parts:
+                os.remove(os.path.join(path, name))
+            parts = []
+        self._next_part = int(parts[-1][5:-8]) + 1 if parts else 0
+        self._rows = []
+
+    def _write(self, record):
+        if self.fieldnames:
+            record = {k: record.get(k) for k in self.fieldnames}
+        self._rows.append(record)
+
+    def _flush(self):
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows)
+        final = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        self._pq.write_table(table, final + ".tmp")
+        os.replace(final + ".tmp", final)
+        self._next_part += 1
+        self._rows = []
+
+    def _close(self):
+        pass
+
+class SqliteSink(_Sink):
+    """Upsert records into an ArticleStore by URL, one transaction per flush."""
+
+    def __init__(self, path, fieldnames=None, mode="a", **kwargs):
+        from article_store import ArticleStore
+        super().__init__(path, fieldnames, **kwargs)
+        self._store = ArticleStore(path)
+        if mode != "a":
+            self._store.clear()
+        self._rows = []
+
+    def _write(self, record):
+        if self.fieldnames:
+            record = {k: record.get(k, "") for k in dict.fromkeys(["url", *self.fieldnames])}
+        self._rows.append(record)
+
+    def _flush(self):
+        if self._rows:
+            self._store.upsert(self._rows)
+            self._rows = []
+
+    def _close(self):
+        self._store.close()
+
+SINKS = {".csv": CsvSink, ".jsonl": JsonlSink, ".parquet": ParquetSink, ".sqlite": SqliteSink, ".db": SqliteSink}
+
+def open_sink(path, fieldnames=None, mode="a", **kwargs):
+    """Open the sink matching the file extension (.csv, .jsonl, .parquet, or .sqlite/.db)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"Unsupported output format: {path}")
+    return SINKS[ext](path, fieldnames, mode=mode, **kwargs)
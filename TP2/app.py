@@ -1,92 +1,256 @@
 # app.py
+import base64
+import binascii
+import gzip
+import json
 import os
-import subprocess
-import pandas as pd
-from flask import Flask, request, render_template, flash, redirect, url_for
+import shlex
+import shutil
+import sys
+import threading
+import time
+import zlib
+from flask import Flask, request, render_template, flash, redirect, url_for, jsonify, g
+# metrics.py est celui de J1, partagé par les deux projets
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'J1'))
+import metrics
+from scheduler import ScrapeScheduler, SNAPSHOT_RE
+from dataset import get_dataset, SORT_KEYS
+from practitioner_store import PractitionerStore
 
 app = Flask(__name__)
 app.secret_key = "change_me" 
 
-CSV_PATH = 'doctolib_results.csv'
-SCRAPER_SCRIPT = '/Users/aymanehajli/Desktop/Web_scraping/TP2/test.py'   
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'doctolib_results.csv')
+SCRAPER_SCRIPT = os.path.join(BASE_DIR, 'test.py')
+PAGE_SIZE = 50
+API_LIMIT = 500
+FILTER_FIELDS = ('specialty', 'assurance', 'consultation_type', 'address_include', 'address_exclude',
+                 'min_price', 'max_price')
 
-def run_scraper():
-    """Lance test.py pour (re)générer le CSV."""
-    
-    if os.path.exists(CSV_PATH):
-        os.remove(CSV_PATH)
-   
+# Avec SCRAPE_DB, les recherches passent par la base SQLite/FTS5 au lieu du CSV chargé en mémoire
+store = PractitionerStore(os.environ['SCRAPE_DB']) if os.environ.get('SCRAPE_DB') else None
+
+scheduler = ScrapeScheduler(
+    SCRAPER_SCRIPT,
+    snapshot_dir=os.environ.get('DOCTOLIB_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots')),
+    interval=int(os.environ.get('DOCTOLIB_REFRESH_INTERVAL', 6 * 3600)),
+    args=shlex.split(os.environ.get('DOCTOLIB_SCRAPER_ARGS', '')),
+    # charge et indexe le nouveau snapshot avant qu'il soit servi
+    on_publish=lambda path: store.import_csv(path) if store else get_dataset(path),
+)
+_seed_lock = threading.Lock()
+if store is not None and not len(store) and scheduler.latest():
+    store.import_csv(scheduler.latest())
+
+def current_csv():
+    """Chemin du dernier snapshot publié (le CSV existant sert de premier snapshot)."""
+    path = scheduler.latest()
+    if path is None and os.path.exists(CSV_PATH):
+        # une seule requête publie le snapshot initial, les autres attendent puis le relisent
+        with _seed_lock:
+            path = scheduler.latest()
+            if path is None:
+                tmp = os.path.join(scheduler.snapshot_dir, '.seed.csv')
+                shutil.copy2(CSV_PATH, tmp)
+                path = scheduler.publish(tmp)
+    return path
+
+def open_dataset(path):
+    """Ce qui répond aux filtres : la base SQLite si elle est configurée, sinon le snapshot CSV."""
+    return store if store else get_dataset(path)
+
+def parse_price(value, error, errors):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        errors.append(error)
+        return None
+
+def read_filters(values, errors):
+    """Paramètres de Dataset.filter() lus depuis un formulaire ou une query string."""
+    text = lambda name: values.get(name, '').strip().lower()
+    return {
+        'specialty': text('specialty'),
+        'assurance': text('assurance'),
+        'consult': text('consultation_type'),
+        'addr_inc': text('address_include'),
+        'addr_exc': text('address_exclude'),
+        'min_price': parse_price(values.get('min_price'), "Prix minimum invalide", errors),
+        'max_price': parse_price(values.get('max_price'), "Prix maximum invalide", errors),
+    }
+
+def encode_cursor(snapshot, offset, query):
+    raw = json.dumps({'s': snapshot, 'o': offset, 'q': query}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return data['s'], int(data['o']), data['q']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+def api_error(message, code=400):
+    return jsonify(error=message), code
+
+def gzipped(response, min_size=1024):
+    """Compresse la réponse si le client accepte gzip et qu'elle en vaut la peine."""
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.headers.get('Accept-Encoding', '') and response.content_length >= min_size:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    if 'started' in g:
+        metrics.observe('flask_request_seconds', time.perf_counter() - g.started,
+                        endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métriques du processus au format Prometheus, ou en JSON avec ?format=json."""
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.snapshot())
+    return metrics.to_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/status')
+def status():
+    return jsonify(scheduler.status())
+
+@app.route('/refresh', methods=['POST'])
+def refresh():
+    scheduler.trigger()
+    return jsonify(scheduler.status()), 202
+
+@app.route('/api/search')
+def api_search():
+    """Résultats filtrés en JSON, page par page.
+
+    Paramètres : ceux du formulaire, plus `sort` (nom, specialty, address ou
+    price, préfixé de `-` pour l'ordre décroissant), `fields` (colonnes
+    séparées par des virgules), `limit` et `cursor`. Le curseur renvoyé dans
+    `next_cursor` fige le snapshot : toutes les pages d'une même recherche
+    viennent du même CSV, même si un nouveau scraping est publié entre-temps.
+    Avec SCRAPE_DB, la base est mise à jour sur place et le curseur ne garde
+    que la position.
+    """
+    errors = []
+    filters = read_filters(request.args, errors)
+    if errors:
+        return api_error(', '.join(errors))
+    sort = request.args.get('sort', '').strip()
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-') or None
+    if sort is not None and sort not in SORT_KEYS:
+        return api_error(f"sort doit être l'un de : {', '.join(SORT_KEYS)}")
     try:
-        subprocess.run(['python3', SCRAPER_SCRIPT], check=True)
-    except subprocess.CalledProcessError as e:
-        flash(f"Le scraper a échoué (code {e.returncode})", "error")
-        return False
-    return True
+        limit = min(API_LIMIT, max(1, int(request.args.get('limit', PAGE_SIZE))))
+    except ValueError:
+        return api_error("limit invalide")
+    query = zlib.crc32(json.dumps([filters, sort, descending], sort_keys=True).encode())
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded is None or not SNAPSHOT_RE.fullmatch(str(decoded[0])) or decoded[1] < 0:
+            return api_error("cursor invalide")
+        snapshot, offset, cursor_query = decoded
+        if cursor_query != query:
+            return api_error("cursor ne correspond pas à cette recherche")
+        path = os.path.join(scheduler.snapshot_dir, snapshot)
+        # La base n'a pas besoin du fichier : seul le mode CSV dépend du snapshot
+        if store is None and not os.path.exists(path):
+            return api_error("snapshot expiré, relancez la recherche sans cursor", 410)
+    else:
+        offset = 0
+        path = current_csv()
+        if scheduler.is_stale():
+            scheduler.trigger()
+        if path is None:
+            return api_error("aucune donnée disponible, scraping en cours", 503)
+
+    with metrics.timer('flask_phase_seconds', endpoint='api_search', phase='read'):
+        dataset = open_dataset(path)
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+    unknown = sorted(set(fields or ()) - set(dataset.columns))
+    if unknown:
+        return api_error(f"colonnes inconnues : {', '.join(unknown)}")
+
+    with metrics.timer('flask_phase_seconds', endpoint='api_search', phase='filter'):
+        indices = dataset.filter(**filters, sort=sort, descending=descending)
+    end = offset + limit
+    snapshot = os.path.basename(path)
+    with metrics.timer('flask_phase_seconds', endpoint='api_search', phase='render'):
+        response = gzipped(jsonify(
+            snapshot=snapshot,
+            total=len(indices),
+            sort=sort,
+            order='desc' if descending else 'asc',
+            items=dataset.records(indices[offset:end], fields),
+            next_cursor=encode_cursor(snapshot, end, query) if end < len(indices) else None,
+        ))
+    return response
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    if request.method == 'POST':
-        
-        success = run_scraper()
-        if not success:
+    values = request.values
+    if request.method == 'POST' or any(name in request.args for name in FILTER_FIELDS + ('page',)):
+
+        # Stale-while-revalidate: serve the current snapshot, refresh in the background
+        path = current_csv()
+        if scheduler.is_stale():
+            scheduler.trigger()
+        if path is None:
+            flash("Aucune donnée disponible pour l'instant : le scraping est en cours, réessayez dans quelques minutes.", "error")
             return redirect(url_for('index'))
 
-       
         try:
-            df = pd.read_csv(CSV_PATH)
+            with metrics.timer('flask_phase_seconds', endpoint='index', phase='read'):
+                dataset = open_dataset(path)
         except Exception as e:
             flash(f"Impossible de lire le CSV : {e}", "error")
             return redirect(url_for('index'))
 
-        
-        specialty = request.form.get('specialty', '').strip().lower()
-        assurance = request.form.get('assurance', '').strip().lower()
-        consult   = request.form.get('consultation_type', '').strip().lower()
-        addr_inc  = request.form.get('address_include', '').strip().lower()
-        addr_exc  = request.form.get('address_exclude', '').strip().lower()
-        min_price = request.form.get('min_price')
-        max_price = request.form.get('max_price')
-
-       
-        if specialty:
-            df = df[df['Spécialité'].str.lower().str.contains(specialty, na=False)]
-        if assurance:
-            df = df[df['Assurance'].str.lower().str.contains(assurance, na=False)]
-        if consult:
-            df = df[df['Type de consultation'].str.lower() == consult]
-        if addr_inc:
-            df = df[df['Adresse'].str.lower().str.contains(addr_inc, na=False)]
-        if addr_exc:
-            df = df[~df['Adresse'].str.lower().str.contains(addr_exc, na=False)]
-
-        import re
-        def extract_price(s):
-            m = re.search(r'(\d+(?:\.\d+)?)\s*€', str(s))
-            return float(m.group(1)) if m else None
-        df['_price'] = df['Tarifs'].map(extract_price)
-
-        if min_price:
-            try:
-                df = df[df['_price'] >= float(min_price)]
-            except ValueError:
-                flash("Prix minimum invalide", "error")
-        if max_price:
-            try:
-                df = df[df['_price'] <= float(max_price)]
-            except ValueError:
-                flash("Prix maximum invalide", "error")
-
-        df.drop(columns=['_price'], inplace=True)
-        rows = df.to_dict(orient='records')
-        count = len(df)
+        errors = []
+        filters = read_filters(values, errors)
+        for error in errors:
+            flash(error, "error")
+
+        # Only the requested page is turned into records and rendered
+        with metrics.timer('flask_phase_seconds', endpoint='index', phase='filter'):
+            indices = dataset.filter(**filters)
+            count = len(indices)
+            pages = max(1, -(-count // PAGE_SIZE))
+            page = min(max(1, values.get('page', 1, type=int)), pages)
+            rows = dataset.records(indices[(page - 1) * PAGE_SIZE:page * PAGE_SIZE])
     else:
         rows = []
         count = 0
+        page = pages = 1
 
-    return render_template('filter.html',
-                           rows=rows,
-                           count=count,
-                           form=request.form)
+    query = {name: values[name] for name in FILTER_FIELDS if values.get(name)}
+    with metrics.timer('flask_phase_seconds', endpoint='index', phase='render'):
+        return render_template('filter.html',
+                               rows=rows,
+                               count=count,
+                               page=page,
+                               pages=pages,
+                               page_url=lambda n: url_for('index', page=n, **query),
+                               form=values)
 
 if __name__ == '__main__':
+    metrics.setup_from_env()
+    # en debug, le reloader relance ce script : seul le processus qui sert les requêtes rafraîchit
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        scheduler.start()
     app.run(debug=True)
@@ -0,0 +1,162 @@
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import metrics
+
+TOKEN_RE = re.compile(r"\w+")
+PRICE_RE = r"(\d+(?:[.,]\d+)?)\s*€"
+INDEXED = {"specialty": "Spécialité", "assurance": "Assurance", "address": "Adresse"}
+SORT_KEYS = {"nom": "Nom", "specialty": "Spécialité", "address": "Adresse", "price": None}
+
+class _IndexedColumn:
+    """A lower-cased text column stored as codes into its distinct values.
+
+    Substring queries are answered on the distinct values only: a token index
+    narrows them down to those containing every query token, the survivors
+    are checked for the full query, and the result is mapped back to rows.
+    """
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values, sort=False)
+        self.codes = codes
+        self.uniques = list(uniques)
+        postings = {}
+        for i, text in enumerate(self.uniques):
+            for token in set(TOKEN_RE.findall(text)):
+                postings.setdefault(token, []).append(i)
+        self.vocab = list(postings)
+        self.postings = [np.array(postings[t], dtype=np.int64) for t in self.vocab]
+        # All tokens in one string, so "tokens containing x" is a single C-level scan.
+        self._joined = "\n".join(self.vocab) + "\n"
+        self._starts = np.cumsum([0] + [len(t) + 1 for t in self.vocab[:-1]])
+
+    def _tokens_containing(self, fragment):
+        positions = [m.start() for m in re.finditer(re.escape(fragment), self._joined)]
+        return np.unique(np.searchsorted(self._starts, positions, side="right") - 1)
+
+    def equals(self, value):
+        """Boolean row mask of the values equal to `value`."""
+        matched = np.append(np.array([u == value for u in self.uniques], dtype=bool), False)
+        return matched[self.codes]
+
+    def contains(self, query):
+        """Boolean row mask of the values containing `query`."""
+        candidates = None
+        for token in TOKEN_RE.findall(query):
+            ids = self._tokens_containing(token)
+            hits = np.unique(np.concatenate([self.postings[i] for i in ids])) if len(ids) else np.empty(0, dtype=np.int64)
+            candidates = hits if candidates is None else np.intersect1d(candidates, hits, assume_unique=True)
+            if not len(candidates):
+                break
+        if candidates is None:
+            candidates = range(len(self.uniques))
+        matched = np.zeros(len(self.uniques) + 1, dtype=bool)  # last slot: missing values (code -1)
+        for i in candidates:
+            if query in self.uniques[i]:
+                matched[i] = True
+        return matched[self.codes]
+
+class Dataset:
+    """One snapshot of the Doctolib CSV, normalised and indexed once at load time.
+
+    Lower-cased columns, per-row min/max prices (ranges such as
+    "250 € à 300 €" included) and a token index over specialty, insurance and
+    address are computed up front; `filter()` answers from those and keeps the
+    most recent results in an LRU cache keyed by the filter parameters.
+    """
+
+    def __init__(self, path, cache_size=256):
+        self.path = path
+        self.df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        self.columns = list(self.df.columns)
+        self._columns = {key: _IndexedColumn(self.df[col].str.lower()) for key, col in INDEXED.items()}
+        self._consult = _IndexedColumn(self.df["Type de consultation"].str.lower())
+        prices = self.df["Tarifs"].str.extractall(PRICE_RE)[0].str.replace(",", ".").astype(float)
+        by_row = prices.groupby(level=0)
+        self.price_min = by_row.min().reindex(range(len(self.df))).to_numpy()
+        self.price_max = by_row.max().reindex(range(len(self.df))).to_numpy()
+        self._ranks = {}
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def _compute(self, specialty, assurance, consult, addr_inc, addr_exc, min_price, max_price):
+        mask = np.ones(len(self.df), dtype=bool)
+        for key, query in (("specialty", specialty), ("assurance", assurance), ("address", addr_inc)):
+            if query:
+                mask &= self._columns[key].contains(query)
+        if addr_exc:
+            mask &= ~self._columns["address"].contains(addr_exc)
+        if consult:
+            mask &= self._consult.equals(consult)
+        if min_price is not None:
+            mask &= self.price_max >= min_price
+        if max_price is not None:
+            mask &= self.price_min <= max_price
+        return np.flatnonzero(mask)
+
+    def _rank(self, sort):
+        """Position of every row in ascending `sort` order; rows without a value get len(df)."""
+        with self._lock:
+            if sort not in self._ranks:
+                n = len(self.df)
+                if sort == "price":
+                    codes, _ = pd.factorize(self.price_min, sort=True)
+                    rank = np.where(codes < 0, n, codes)
+                else:
+                    rank, _ = pd.factorize(self.df[SORT_KEYS[sort]].str.lower(), sort=True)
+                self._ranks[sort] = rank
+            return self._ranks[sort]
+
+    def _order(self, indices, sort, descending):
+        rank = self._rank(sort)[indices]
+        if descending:
+            rank = np.where(rank == len(self.df), len(self.df), -rank)  # missing values stay last
+        return indices[np.argsort(rank, kind="stable")]
+
+    def filter(self, specialty="", assurance="", consult="", addr_inc="", addr_exc="", min_price=None, max_price=None,
+               sort=None, descending=False):
+        """Indices of the matching rows. Text filters are lower-cased substrings.
+
+        Rows come in file order unless `sort` names one of SORT_KEYS; ties keep file order.
+        """
+        if sort is not None and sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key: {sort}")
+        filters = (specialty, assurance, consult, addr_inc, addr_exc, min_price, max_price)
+        key = filters + (sort, descending)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        if sort is None:
+            result = self._compute(*filters)
+        else:
+            result = self._order(self.filter(*filters), sort, descending)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def records(self, indices, fields=None):
+        frame = self.df.iloc[indices]
+        return (frame if fields is None else frame[list(fields)]).to_dict(orient="records")
+
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+def get_dataset(path, keep=2):
+    """The Dataset for a snapshot path, loaded once; only the `keep` latest snapshots stay in memory."""
+    with _loaded_lock:
+        dataset = _loaded.get(path)
+        if dataset is None:
+            with metrics.timer("dataset_load_seconds"):
+                dataset = _loaded[path] = Dataset(path)
+            while len(_loaded) > keep:
+                _loaded.popitem(last=False)
+        return dataset
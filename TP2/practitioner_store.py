@@ -0,0 +1,198 @@
+import csv
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.environ.get("SCRAPE_DB", "scrape.sqlite")
+PRICE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*€")
+
+# Colonnes du CSV du scraper -> colonnes de la table.
+COLUMNS = {
+    "Nom": "nom",
+    "Spécialité": "specialite",
+    "Adresse": "adresse",
+    "Assurance": "assurance",
+    "Disponibilités": "disponibilites",
+    "Type de consultation": "type_consultation",
+    "Tarifs": "tarifs",
+}
+SORT_COLUMNS = {"nom": "nom", "specialty": "specialite", "address": "adresse"}
+FTS_COLUMNS = {"specialty": "specialite", "assurance": "assurance", "address": "adresse"}
+
+# Index FTS5 "trigram" : un MATCH sur une phrase entre guillemets est une
+# recherche de sous-chaîne insensible à la casse, comme les filtres du CSV.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS practitioners (
+    id                INTEGER PRIMARY KEY,
+    nom               TEXT NOT NULL,
+    specialite        TEXT,
+    adresse           TEXT NOT NULL,
+    assurance         TEXT,
+    disponibilites    TEXT,
+    type_consultation TEXT,
+    tarifs            TEXT,
+    price_min         REAL,
+    price_max         REAL,
+    updated_at        REAL NOT NULL,
+    UNIQUE (nom, specialite)
+);
+CREATE INDEX IF NOT EXISTS practitioners_price ON practitioners(price_min, price_max);
+CREATE VIRTUAL TABLE IF NOT EXISTS practitioners_fts USING fts5(
+    specialite, assurance, adresse, content='practitioners', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS practitioners_ai AFTER INSERT ON practitioners BEGIN
+    INSERT INTO practitioners_fts(rowid, specialite, assurance, adresse)
+    VALUES (new.id, new.specialite, new.assurance, new.adresse);
+END;
+CREATE TRIGGER IF NOT EXISTS practitioners_ad AFTER DELETE ON practitioners BEGIN
+    INSERT INTO practitioners_fts(practitioners_fts, rowid, specialite, assurance, adresse)
+    VALUES ('delete', old.id, old.specialite, old.assurance, old.adresse);
+END;
+CREATE TRIGGER IF NOT EXISTS practitioners_au AFTER UPDATE ON practitioners BEGIN
+    INSERT INTO practitioners_fts(practitioners_fts, rowid, specialite, assurance, adresse)
+    VALUES ('delete', old.id, old.specialite, old.assurance, old.adresse);
+    INSERT INTO practitioners_fts(rowid, specialite, assurance, adresse)
+    VALUES (new.id, new.specialite, new.assurance, new.adresse);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO practitioners (nom, specialite, adresse, assurance, disponibilites, type_consultation, tarifs,
+                           price_min, price_max, updated_at)
+VALUES (:nom, :specialite, :adresse, :assurance, :disponibilites, :type_consultation, :tarifs,
+        :price_min, :price_max, :updated_at)
+ON CONFLICT(nom, specialite) DO UPDATE SET
+    adresse = excluded.adresse, assurance = excluded.assurance, disponibilites = excluded.disponibilites,
+    type_consultation = excluded.type_consultation, tarifs = excluded.tarifs,
+    price_min = excluded.price_min, price_max = excluded.price_max, updated_at = excluded.updated_at
+"""
+
+def connect(path):
+    """Ouvre la base partagée en mode WAL : les lectures ne bloquent pas l'écriture."""
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    try:
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        db.close()
+        raise RuntimeError(f"SQLite {sqlite3.sqlite_version} a été compilé sans FTS5")
+    db.create_function("py_lower", 1, lambda s: s.lower() if s else s, deterministic=True)
+    return db
+
+def _row(record):
+    row = {col: record.get(name, "") or "" for name, col in COLUMNS.items()}
+    prices = [float(p.replace(",", ".")) for p in PRICE_RE.findall(row["tarifs"])]
+    row.update(price_min=min(prices, default=None), price_max=max(prices, default=None), updated_at=time.time())
+    return row
+
+def _phrase(query):
+    return '"' + query.replace('"', '""') + '"'
+
+class PractitionerStore:
+    """Les praticiens Doctolib dans SQLite, avec les mêmes filtres que dataset.Dataset.
+
+    `filter()` renvoie les ids des lignes trouvées et `records()` ne lit que
+    la page demandée : le coût d'une recherche suit le nombre de résultats,
+    pas la taille de la table.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.columns = list(COLUMNS)
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def upsert(self, records):
+        """Insère ou met à jour un lot de lignes (clé : nom + spécialité) en une transaction."""
+        rows = [_row(r) for r in records]
+        with self._lock, self._db:
+            self._db.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def import_csv(self, path, batch_size=1000):
+        """Remplace le contenu de la table par un snapshot CSV de test.py ; renvoie le nombre de lignes lues.
+
+        Tout se fait en une transaction : les praticiens absents du snapshot
+        disparaissent, les ids suivent l'ordre du fichier comme dans
+        dataset.Dataset, et les lecteurs voient l'ancien ou le nouveau
+        contenu, jamais un mélange.
+        """
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f, self._lock, self._db:
+            self._db.execute("DELETE FROM practitioners")
+            batch = []
+            for record in csv.DictReader(f):
+                batch.append(_row(record))
+                if len(batch) >= batch_size:
+                    self._db.executemany(_UPSERT, batch)
+                    count += len(batch)
+                    batch = []
+            self._db.executemany(_UPSERT, batch)
+            count += len(batch)
+        return count
+
+    def _contains(self, key, query):
+        column = FTS_COLUMNS[key]
+        if len(query) >= 3:
+            return (f"id IN (SELECT rowid FROM practitioners_fts WHERE practitioners_fts MATCH ?)",
+                    f"{column}:{_phrase(query)}")
+        # Moins de 3 caractères : pas de trigramme, on parcourt la colonne
+        return f"instr(py_lower({column}), ?) > 0", query
+
+    def filter(self, specialty="", assurance="", consult="", addr_inc="", addr_exc="", min_price=None, max_price=None,
+               sort=None, descending=False):
+        """Ids des lignes trouvées, dans l'ordre d'insertion ou selon `sort` (nom, specialty, address, price)."""
+        where, params = [], []
+        for key, query in (("specialty", specialty), ("assurance", assurance), ("address", addr_inc)):
+            if query:
+                clause, param = self._contains(key, query)
+                where.append(clause)
+                params.append(param)
+        if addr_exc:
+            clause, param = self._contains("address", addr_exc)
+            where.append(f"NOT ({clause})")
+            params.append(param)
+        if consult:
+            where.append("py_lower(type_consultation) = ?")
+            params.append(consult)
+        if min_price is not None:
+            where.append("price_max >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("price_min <= ?")
+            params.append(max_price)
+
+        direction = "DESC" if descending else "ASC"
+        if sort is None:
+            order = "id"
+        elif sort == "price":
+            order = f"price_min IS NULL, price_min {direction}, id"
+        elif sort in SORT_COLUMNS:
+            order = f"py_lower({SORT_COLUMNS[sort]}) {direction}, id"
+        else:
+            raise ValueError(f"unknown sort key: {sort}")
+        sql = f"SELECT id FROM practitioners {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {order}"
+        with self._lock:
+            return [r[0] for r in self._db.execute(sql, params)]
+
+    def records(self, ids, fields=None):
+        """Les lignes de `ids`, dans cet ordre, avec les noms de colonnes du CSV."""
+        ids = list(ids)
+        names = fields or self.columns
+        select = ", ".join(COLUMNS[name] for name in names)
+        with self._lock:
+            rows = {r[0]: r[1:] for r in self._db.execute(
+                f"SELECT id, {select} FROM practitioners WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        return [dict(zip(names, rows[i])) for i in ids if i in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM practitioners").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
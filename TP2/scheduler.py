@@ -0,0 +1,185 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-flight within the process only
+    fcntl = None
+
+SNAPSHOT_RE = re.compile(r"doctolib-(\d{8}T\d{6}(?:-\d+)?)\.csv")
+
+class ScrapeScheduler:
+    """Runs the Doctolib scraper in the background and publishes versioned CSV snapshots.
+
+    Every run writes to a temporary file; on success the file is renamed to
+    `doctolib-<timestamp>.csv` and the CURRENT pointer is swapped atomically,
+    so readers always see a complete snapshot. Only one run happens at a time,
+    across threads and (through a lock file) across processes. After a failed
+    run, no refresh starts for `retry_delay` seconds, doubled on every
+    further failure up to `interval`; triggers in that window are ignored.
+    """
+
+    def __init__(self, script, snapshot_dir="snapshots", interval=6 * 3600, args=(), keep=5, on_publish=None,
+                 retry_delay=60):
+        self.script = script
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.args = list(args)
+        self.keep = keep
+        self.on_publish = on_publish
+        self.retry_delay = retry_delay
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._status = {"state": "idle", "last_started": None, "last_finished": None,
+                        "last_duration_s": None, "last_error": None, "runs": 0,
+                        "consecutive_failures": 0, "next_attempt_at": None}
+
+    def _pointer(self):
+        return os.path.join(self.snapshot_dir, "CURRENT")
+
+    def latest(self):
+        """Path of the current snapshot, or None if there is none yet."""
+        try:
+            with open(self._pointer(), encoding="utf-8") as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(self.snapshot_dir, name)
+        return path if os.path.exists(path) else None
+
+    def version(self):
+        path = self.latest()
+        m = SNAPSHOT_RE.fullmatch(os.path.basename(path)) if path else None
+        return m.group(1) if m else None
+
+    def age(self):
+        path = self.latest()
+        return time.time() - os.path.getmtime(path) if path else None
+
+    def is_stale(self):
+        age = self.age()
+        return age is None or age > self.interval
+
+    def publish(self, csv_path):
+        """Move a finished CSV into the snapshot directory and make it current.
+
+        `on_publish(path)` runs before the pointer is swapped, so a snapshot
+        can be preloaded before any request sees it.
+        """
+        name = f"doctolib-{datetime.now().strftime('%Y%m%dT%H%M%S')}.csv"
+        n = 1
+        while os.path.exists(os.path.join(self.snapshot_dir, name)):
+            name = f"doctolib-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{n}.csv"
+            n += 1
+        path = os.path.join(self.snapshot_dir, name)
+        shutil.move(csv_path, path)
+        if self.on_publish:
+            self.on_publish(path)
+        tmp = self._pointer() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(tmp, self._pointer())
+        self._prune(name)
+        return path
+
+    def _prune(self, current):
+        names = sorted(n for n in os.listdir(self.snapshot_dir) if SNAPSHOT_RE.fullmatch(n) and n != current)
+        for name in names[:max(0, len(names) - (self.keep - 1))]:
+            os.remove(os.path.join(self.snapshot_dir, name))
+
+    def refresh(self):
+        """Run the scraper now unless a run is already in progress; True if a snapshot was published."""
+        if not self._run_lock.acquire(blocking=False):
+            return False
+        lock_file = open(os.path.join(self.snapshot_dir, ".lock"), "w")
+        try:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False
+            return self._run()
+        finally:
+            lock_file.close()
+            self._run_lock.release()
+
+    def _run(self):
+        tmp = os.path.join(self.snapshot_dir, f".run-{os.getpid()}.csv")
+        started = time.time()
+        self._status.update(state="running", last_started=started)
+        try:
+            subprocess.run([sys.executable, self.script, "--output", tmp, *self.args],
+                           check=True, cwd=os.path.dirname(os.path.abspath(self.script)))
+            self.publish(tmp)
+            self._status.update(last_error=None, consecutive_failures=0)
+            return True
+        except Exception as e:
+            self._status.update(last_error=str(e), consecutive_failures=self._status["consecutive_failures"] + 1)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        finally:
+            finished = time.time()
+            metrics.observe("scrape_run_seconds", finished - started)
+            metrics.inc("scrape_runs_total", outcome="error" if self._status["last_error"] else "ok")
+            failures = self._status["consecutive_failures"]
+            backoff = min(self.retry_delay * 2 ** (failures - 1), self.interval) if failures else None
+            self._status.update(state="idle", last_finished=finished,
+                                next_attempt_at=None if backoff is None else finished + backoff,
+                                last_duration_s=round(finished - started, 1), runs=self._status["runs"] + 1)
+
+    def trigger(self):
+        """Ask for a refresh without waiting for it.
+
+        A request made while a run is in progress joins that run, and one
+        made during the backoff after a failure is dropped. If the periodic
+        loop was not started, the refresh runs on its own thread.
+        """
+        if self._run_lock.locked() or self._backing_off():
+            return
+        if self._thread is not None and self._thread.is_alive():
+            self._wake.set()
+        else:
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def start(self):
+        """Start the background loop that refreshes stale snapshots; call it once from the serving process."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _backing_off(self):
+        next_attempt = self._status["next_attempt_at"]
+        return next_attempt is not None and time.time() < next_attempt
+
+    def _delay(self):
+        """Seconds until the next check: the snapshot's remaining lifetime, or the backoff after failures."""
+        age = self.age()
+        if age is not None and age < self.interval:
+            return self.interval - age
+        next_attempt = self._status["next_attempt_at"]
+        return max(0, next_attempt - time.time()) if next_attempt is not None else self.retry_delay
+
+    def _loop(self):
+        while True:
+            if self._wake.is_set() or (self.is_stale() and not self._backing_off()):
+                self.refresh()
+                self._wake.clear()
+            self._wake.wait(timeout=self._delay())
+
+    def status(self):
+        age = self.age()
+        status = dict(self._status)
+        status.update(snapshot=self.version(), snapshot_age_s=None if age is None else round(age),
+                      stale=self.is_stale(), interval_s=self.interval,
+                      next_run_in_s=None if age is None else max(0, round(self.interval - age)))
+        return status
@@ -1,5 +1,17 @@
+import argparse
 import csv
+import itertools
+import os
+import queue
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import requests
+import lxml.etree
+import lxml.html
+from lxml.cssselect import CSSSelector
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -9,156 +21,566 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
     NoSuchElementException,
     TimeoutException,
-    ElementClickInterceptedException
+    WebDriverException,
+    InvalidSessionIdException
 )
+# metrics.py est celui de J1, partagé par les deux projets
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "J1"))
+import metrics
+from practitioner_store import PractitionerStore
 
-# 1) Setup webdriver and wait
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service)
-wait = WebDriverWait(driver, 30)
-
-# 2) Go to Doctolib and reject cookies
-driver.get("https://www.doctolib.fr/")
-try:
-    btn = wait.until(EC.element_to_be_clickable((By.ID, "didomi-notice-disagree-button")))
-    btn.click()
-    wait.until(EC.invisibility_of_element_located((By.ID, "didomi-notice-disagree-button")))
-except:
-    pass
-
-# 3) Enter “Montpellier” and search
-place = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "input.searchbar-input.searchbar-place-input")))
-place.clear()
-place.send_keys("Montpellier")
-wait.until(EC.text_to_be_present_in_element_value(
-    (By.CSS_SELECTOR, "input.searchbar-input.searchbar-place-input"),
-    "Montpellier"
-))
-search_btn = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.searchbar-submit-button.dl-button-primary")))
-search_btn.click()
-
-# 4) Grab cards
-wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-test='total-number-of-results']")))
-cards = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".w-full")))
-
-# 5) Prepare CSV
-fieldnames = ["Nom", "Spécialité", "Adresse", "Assurance", "Disponibilités", "Type de consultation", "Tarifs"]
-rows = []
-seen = set()
-driver.implicitly_wait(1)
-
-# 6) Loop, limit to 10 entries
-for card in cards:
-    if len(rows) >= 10:
-        break
-
-    # — Nom
-    try:
-        title = card.find_element(By.CSS_SELECTOR, ".dl-text-bold.dl-text-primary-110").text.strip()
-    except:
-        continue
+FEES_MODE = os.environ.get("DOCTOLIB_FEES_MODE", "tabs")  # "tabs" or "http"
+FEES_CONCURRENCY = int(os.environ.get("DOCTOLIB_FEES_CONCURRENCY", "4"))
+CARDS_MODE = os.environ.get("DOCTOLIB_CARDS_MODE", "js")  # "js", "lxml" or "webdriver"
+FIELDNAMES = ["Nom", "Spécialité", "Adresse", "Assurance", "Disponibilités", "Type de consultation", "Tarifs"]
 
-    # — Spécialité
-    try:
-        speciality = card.find_element(By.CSS_SELECTOR, ".dl-doctor-card-speciality-title").text.strip()
-    except:
-        speciality = ""
+def has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
 
-    key = (title, speciality)
-    if key in seen:
-        continue
-    seen.add(key)
+FEE_XPATH = f"//div[{has_class('dl-profile-fee')}]"
+FEE_NAME_XPATH = f".//*[{has_class('dl-profile-fee-name')}]"
+FEE_TAG_XPATH = f".//*[{has_class('dl-profile-fee-tag')}]"
 
-    # — Adresse
-    try:
-        addr_div = card.find_element(By.CSS_SELECTOR, "div.mt-8.gap-8.flex")
-        parts = addr_div.find_elements(By.CSS_SELECTOR, "p.dl-text-neutral-130")
-        address = ", ".join(p.text.strip() for p in parts if p.text.strip())
-    except:
-        address = ""
+def format_fees(fees):
+    """Keep the (name, tag) fee pairs the CSV reports, or "Indisponible"."""
+    tarifs = [f"{name}: {tag}" for name, tag in fees]
+    valid = [t for t in tarifs if "In" in t]
+    return " | ".join(valid) if valid else "Indisponible"
 
-    # — Assurance
-    try:
-        assurance = card.find_element(
-            By.CSS_SELECTOR,
-            "div.mt-8.gap-8.flex > div.flex.flex-wrap.gap-x-4 > p.dl-text-neutral-130"
-        ).text.strip()
-    except NoSuchElementException:
-        assurance = ""
-
-    # — Disponibilités
-    try:
-        slots = card.find_elements(By.CSS_SELECTOR, ".availabilities-slot-desktop")
-        texts = [s.text.strip() for s in slots if s.text.strip()]
-        if not texts:
-            fallback = card.find_elements(
-                By.CSS_SELECTOR,
-                ".dl-text-left.dl-text-primary-110, .dl-text-left.dl-text-neutral-130"
-            )
-            texts = [f.text.strip() for f in fallback if f.text.strip()]
-        availabilities = " | ".join(texts)
-    except:
-        availabilities = ""
-
-    # — Type de consultation
+def fees_from_html(html):
+    doc = lxml.html.document_fromstring(html)
+    fees = []
+    for fee in doc.xpath(FEE_XPATH):
+        name, tag = fee.xpath(FEE_NAME_XPATH), fee.xpath(FEE_TAG_XPATH)
+        if name and tag:
+            fees.append((name[0].text_content().strip(), tag[0].text_content().strip()))
+    return fees
+
+def collect_fees_http(driver, hrefs, concurrency=FEES_CONCURRENCY):
+    """Fetch profile pages over plain HTTP with the browser's cookies, concurrently."""
+    session = requests.Session()
+    session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent")
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"))
+
+    def fetch(href):
+        try:
+            response = session.get(href, timeout=15)
+            response.raise_for_status()
+            return href, format_fees(fees_from_html(response.text))
+        except Exception:
+            return href, "Indisponible"
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        yield from pool.map(fetch, hrefs)
+
+def collect_fees_tabs(driver, wait, hrefs, tabs=FEES_CONCURRENCY):
+    """Open profiles `tabs` at a time so the browser loads them in parallel, then read each tab."""
+    results_tab = driver.current_window_handle
+    for i in range(0, len(hrefs), tabs):
+        opened = []
+        for href in hrefs[i:i + tabs]:
+            before = set(driver.window_handles)
+            driver.execute_script("window.open(arguments[0], '_blank');", href)
+            opened.append((href, (set(driver.window_handles) - before).pop()))
+            driver.switch_to.window(results_tab)
+        for href, handle in opened:
+            driver.switch_to.window(handle)
+            try:
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.dl-profile-text")))
+                fees = [
+                    (fee.find_element(By.CSS_SELECTOR, ".dl-profile-fee-name").text.strip(),
+                     fee.find_element(By.CSS_SELECTOR, ".dl-profile-fee-tag").text.strip())
+                    for fee in driver.find_elements(By.CSS_SELECTOR, "div.dl-profile-fee")
+                ]
+                tarif_output = format_fees(fees)
+            except Exception:
+                tarif_output = "Indisponible"
+            driver.close()
+            yield href, tarif_output
+        driver.switch_to.window(results_tab)
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# Requests the lean profile never lets through: media, fonts and third-party trackers.
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",
+    "*.mp4", "*.webm", "*.mp3",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*", "*facebook.net*",
+    "*hotjar.com*", "*criteo.com*", "*criteo.net*", "*bing.com*", "*tiktok.com*", "*sentry.io*",
+    "*datadoghq*", "*optimizely.com*", "*app-measurement.com*",
+]
+
+def new_driver(headless=True, profile="lean"):
+    """Start one Chrome session; the driver binary is resolved once per process.
+
+    The "lean" profile skips images and fonts, blocks trackers through CDP and
+    returns from navigation at DOMContentLoaded; "full" loads everything.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1366,900")
+    if profile == "lean":
+        options.page_load_strategy = "eager"
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+        options.add_argument("--blink-settings=imagesEnabled=false")
+    driver = webdriver.Chrome(service=Service(_driver_path), options=options)
+    if profile == "lean":
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    return driver
+
+def session_alive(driver):
+    """False once the browser or its session is gone; a failed wait leaves the session usable."""
     try:
-        card.find_element(By.XPATH, ".//svg//path[contains(@d, 'M10.25 4.625v6.75c0 .633')]")
-        consultation_type = "Visio"
-    except NoSuchElementException:
-        consultation_type = "Présentiel"
+        driver.current_url
+        return True
+    except WebDriverException:
+        return False
+
+PAGE_TIMING_JS = """
+const nav = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+return {
+    dom_content_loaded_ms: nav ? Math.round(nav.domContentLoadedEventEnd) : null,
+    load_ms: nav && nav.loadEventEnd ? Math.round(nav.loadEventEnd) : null,
+    resources: resources.length,
+    transfer_kb: Math.round(resources.reduce((n, r) => n + (r.transferSize || 0), 0) / 1024),
+};
+"""
 
-    # — Tarifs
-    tarif_output = "Indisponible"
+def page_timing(driver):
+    """Navigation Timing figures for the current page."""
+    return driver.execute_script(PAGE_TIMING_JS)
+
+def reject_cookies(driver, wait):
+    """Dismiss the consent banner unless this session already answered it."""
+    if driver.get_cookie("didomi_token"):
+        return
     try:
-        link = card.find_element(By.CSS_SELECTOR, "a.dl-p-doctor-result-link")
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", link)
-        wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.dl-p-doctor-result-link")))
+        btn = wait.until(EC.element_to_be_clickable((By.ID, "didomi-notice-disagree-button")))
+        btn.click()
+        wait.until(EC.invisibility_of_element_located((By.ID, "didomi-notice-disagree-button")))
+    except TimeoutException:
+        pass
+
+def search(driver, wait, city, specialty="", timing=None):
+    """Run one Doctolib search from the home page and wait for the result cards."""
+    timing = {} if timing is None else timing
+
+    # 1) Go to Doctolib and reject cookies (the banner only shows once per session)
+    start = time.perf_counter()
+    driver.get("https://www.doctolib.fr/")
+    timing["home_s"] = time.perf_counter() - start
+    timing["home_page"] = page_timing(driver)
+    reject_cookies(driver, WebDriverWait(driver, 10))
+
+    # 2) Enter specialty and city, then search
+    if specialty:
+        query = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "input.searchbar-input.searchbar-query-input")))
+        query.clear()
+        query.send_keys(specialty)
+    place = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "input.searchbar-input.searchbar-place-input")))
+    place.clear()
+    place.send_keys(city)
+    wait.until(EC.text_to_be_present_in_element_value(
+        (By.CSS_SELECTOR, "input.searchbar-input.searchbar-place-input"),
+        city
+    ))
+    search_btn = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.searchbar-submit-button.dl-button-primary")))
+    start = time.perf_counter()
+    search_btn.click()
+
+    # 3) Grab cards
+    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-test='total-number-of-results']")))
+    cards = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".w-full")))
+    timing["results_s"] = time.perf_counter() - start
+    timing["results_page"] = page_timing(driver)
+    return cards
+
+def read_cards_webdriver(driver, cards, limit, claim):
+    """Read up to `limit` new cards; `claim(key)` is False for an already seen (title, speciality).
+
+    Every field is its own WebDriver round trip; see read_cards_js for the fast path.
+    """
+    rows = []
+    driver.implicitly_wait(1)
+    for card in cards:
+        if len(rows) >= limit:
+            break
+
+        # — Nom
+        try:
+            title = card.find_element(By.CSS_SELECTOR, ".dl-text-bold.dl-text-primary-110").text.strip()
+        except:
+            continue
+
+        # — Spécialité
+        try:
+            speciality = card.find_element(By.CSS_SELECTOR, ".dl-doctor-card-speciality-title").text.strip()
+        except:
+            speciality = ""
+
+        if not claim((title, speciality)):
+            continue
+
+        # — Adresse
+        try:
+            addr_div = card.find_element(By.CSS_SELECTOR, "div.mt-8.gap-8.flex")
+            parts = addr_div.find_elements(By.CSS_SELECTOR, "p.dl-text-neutral-130")
+            address = ", ".join(p.text.strip() for p in parts if p.text.strip())
+        except:
+            address = ""
+
+        # — Assurance
         try:
-            link.click()
-        except ElementClickInterceptedException:
-            time.sleep(1)
-            driver.execute_script("arguments[0].click();", link)
-
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.dl-profile-text")))
-        fee_divs = driver.find_elements(By.CSS_SELECTOR, "div.dl-profile-fee")
-        if fee_divs:
-            tarifs = [
-                f"{fee.find_element(By.CSS_SELECTOR, '.dl-profile-fee-name').text.strip()}: "
-                f"{fee.find_element(By.CSS_SELECTOR, '.dl-profile-fee-tag').text.strip()}"
-                for fee in fee_divs
-            ]
-            valid = [t for t in tarifs if "In" in t]
-            if valid:
-                tarif_output = " | ".join(valid)
-
-        driver.back()
-        time.sleep(1)
-        wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".w-full")))
-    except:
+            assurance = card.find_element(
+                By.CSS_SELECTOR,
+                "div.mt-8.gap-8.flex > div.flex.flex-wrap.gap-x-4 > p.dl-text-neutral-130"
+            ).text.strip()
+        except NoSuchElementException:
+            assurance = ""
+
+        # — Disponibilités
         try:
-            driver.back()
-            time.sleep(1)
-            wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".w-full")))
+            slots = card.find_elements(By.CSS_SELECTOR, ".availabilities-slot-desktop")
+            texts = [s.text.strip() for s in slots if s.text.strip()]
+            if not texts:
+                fallback = card.find_elements(
+                    By.CSS_SELECTOR,
+                    ".dl-text-left.dl-text-primary-110, .dl-text-left.dl-text-neutral-130"
+                )
+                texts = [f.text.strip() for f in fallback if f.text.strip()]
+            availabilities = " | ".join(texts)
         except:
-            pass
-
-    rows.append({
-        "Nom": title,
-        "Spécialité": speciality,
-        "Adresse": address,
-        "Assurance": assurance,
-        "Disponibilités": availabilities,
-        "Type de consultation": consultation_type,
-        "Tarifs": tarif_output
-    })
-
-# 7) Write CSV
-with open("doctolib_results.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(rows)
-
-print(f"Wrote {len(rows)} rows to doctolib_results.csv")
-
-time.sleep(2)
-driver.quit()
+            availabilities = ""
+
+        # — Type de consultation
+        try:
+            card.find_element(By.XPATH, ".//svg//path[contains(@d, 'M10.25 4.625v6.75c0 .633')]")
+            consultation_type = "Visio"
+        except NoSuchElementException:
+            consultation_type = "Présentiel"
+
+        # — Profile link (fees are read afterwards, without reloading the result list)
+        try:
+            href = card.find_element(By.CSS_SELECTOR, "a.dl-p-doctor-result-link").get_attribute("href")
+        except NoSuchElementException:
+            href = None
+
+        rows.append({
+            "Nom": title,
+            "Spécialité": speciality,
+            "Adresse": address,
+            "Assurance": assurance,
+            "Disponibilités": availabilities,
+            "Type de consultation": consultation_type,
+            "Tarifs": "Indisponible",
+            "_href": href
+        })
+    driver.implicitly_wait(0)
+    return rows
+
+def attach_fees(driver, wait, rows, mode=FEES_MODE, concurrency=FEES_CONCURRENCY):
+    """Fill in Tarifs for the rows, yielding each one as soon as its fees are known."""
+    by_href = {}
+    for row in rows:
+        href = row.pop("_href")
+        if href:
+            by_href.setdefault(href, []).append(row)
+        else:
+            yield row
+
+    if mode == "http":
+        fees = collect_fees_http(driver, list(by_href), concurrency)
+    else:
+        fees = collect_fees_tabs(driver, wait, list(by_href), concurrency)
+    for href, tarif_output in fees:
+        for row in by_href[href]:
+            row["Tarifs"] = tarif_output
+            yield row
+
+# Same selectors as read_cards_webdriver, evaluated in the page in one call.
+CARDS_JS = """
+const text = el => (el ? el.innerText.trim() : "");
+return arguments[0].map(card => {
+    const title = card.querySelector(".dl-text-bold.dl-text-primary-110");
+    if (!title) return null;
+    const addr = card.querySelector("div.mt-8.gap-8.flex");
+    let slots = [...card.querySelectorAll(".availabilities-slot-desktop")].map(text).filter(Boolean);
+    if (!slots.length) {
+        slots = [...card.querySelectorAll(".dl-text-left.dl-text-primary-110, .dl-text-left.dl-text-neutral-130")]
+            .map(text).filter(Boolean);
+    }
+    const link = card.querySelector("a.dl-p-doctor-result-link");
+    return {
+        "Nom": text(title),
+        "Spécialité": text(card.querySelector(".dl-doctor-card-speciality-title")),
+        "Adresse": addr ? [...addr.querySelectorAll("p.dl-text-neutral-130")].map(text).filter(Boolean).join(", ") : "",
+        "Assurance": text(card.querySelector("div.mt-8.gap-8.flex > div.flex.flex-wrap.gap-x-4 > p.dl-text-neutral-130")),
+        "Disponibilités": slots.join(" | "),
+        "Type de consultation": [...card.querySelectorAll("svg path")]
+            .some(p => (p.getAttribute("d") || "").includes("M10.25 4.625v6.75c0 .633")) ? "Visio" : "Présentiel",
+        "_href": link ? link.href : null
+    };
+});
+"""
+
+def _keep_new(cards, limit, claim):
+    rows = []
+    for row in cards:
+        if len(rows) >= limit:
+            break
+        if row and claim((row["Nom"], row["Spécialité"])):
+            row["Tarifs"] = "Indisponible"
+            rows.append(row)
+    return rows
+
+def read_cards_js(driver, cards, limit, claim):
+    """Read every card with a single execute_script returning structured rows."""
+    return _keep_new(driver.execute_script(CARDS_JS, cards), limit, claim)
+
+CARD_SELECTORS = {
+    "card": CSSSelector(".w-full"),
+    "title": CSSSelector(".dl-text-bold.dl-text-primary-110"),
+    "speciality": CSSSelector(".dl-doctor-card-speciality-title"),
+    "addr": CSSSelector("div.mt-8.gap-8.flex"),
+    "addr_parts": CSSSelector("p.dl-text-neutral-130"),
+    "assurance": CSSSelector("div.mt-8.gap-8.flex > div.flex.flex-wrap.gap-x-4 > p.dl-text-neutral-130"),
+    "slots": CSSSelector(".availabilities-slot-desktop"),
+    "slots_fallback": CSSSelector(".dl-text-left.dl-text-primary-110, .dl-text-left.dl-text-neutral-130"),
+    "link": CSSSelector("a.dl-p-doctor-result-link"),
+}
+VISIO_XPATH = lxml.etree.XPath(".//*[local-name()='svg']//*[local-name()='path'][contains(@d, 'M10.25 4.625v6.75c0 .633')]")
+
+def read_cards_lxml(driver, cards, limit, claim):
+    """Read every card from one page_source snapshot parsed with lxml."""
+    sel = CARD_SELECTORS
+    text = lambda els: els[0].text_content().strip() if els else ""
+    doc = lxml.html.document_fromstring(driver.page_source)
+    rows = []
+    for card in sel["card"](doc):
+        title = sel["title"](card)
+        if not title:
+            continue
+        addr = sel["addr"](card)
+        slots = [t for t in (s.text_content().strip() for s in sel["slots"](card)) if t]
+        if not slots:
+            slots = [t for t in (s.text_content().strip() for s in sel["slots_fallback"](card)) if t]
+        link = sel["link"](card)
+        rows.append({
+            "Nom": text(title),
+            "Spécialité": text(sel["speciality"](card)),
+            "Adresse": ", ".join(t for t in (p.text_content().strip() for p in sel["addr_parts"](addr[0])) if t) if addr else "",
+            "Assurance": text(sel["assurance"](card)),
+            "Disponibilités": " | ".join(slots),
+            "Type de consultation": "Visio" if VISIO_XPATH(card) else "Présentiel",
+            "_href": urljoin(driver.current_url, link[0].get("href")) if link and link[0].get("href") else None,
+        })
+    return _keep_new(rows, limit, claim)
+
+CARD_READERS = {"js": read_cards_js, "lxml": read_cards_lxml, "webdriver": read_cards_webdriver}
+
+def run_query(driver, city, specialty, limit, claim, fees_mode=FEES_MODE, fees_concurrency=FEES_CONCURRENCY,
+              cards_mode=CARDS_MODE, timeout=30, timings=None):
+    """Scrape one query; if `timings` is a list, a per-step timing dict is appended to it."""
+    wait = WebDriverWait(driver, timeout)
+    timing = {"query": (city, specialty)}
+    cards = search(driver, wait, city, specialty, timing)
+    start = time.perf_counter()
+    rows = CARD_READERS[cards_mode](driver, cards, limit, claim)
+    timing["cards_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = list(attach_fees(driver, wait, rows, fees_mode, fees_concurrency))
+    timing["fees_s"] = time.perf_counter() - start
+    for step in ("home", "results", "cards", "fees"):
+        metrics.observe("webdriver_step_seconds", timing[f"{step}_s"], step=step)
+    metrics.inc("doctolib_rows_total", len(rows))
+    if timings is not None:
+        timings.append(timing)
+    return rows
+
+def print_timing_report(timings_by_profile):
+    """Print mean step times and page-load figures, one column per browser profile."""
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+
+    lines = [
+        ("home page (s)", lambda t: t["home_s"]),
+        ("home DOMContentLoaded (ms)", lambda t: t["home_page"]["dom_content_loaded_ms"]),
+        ("home load event (ms)", lambda t: t["home_page"]["load_ms"]),
+        ("home resources", lambda t: t["home_page"]["resources"]),
+        ("home transfer (KB)", lambda t: t["home_page"]["transfer_kb"]),
+        ("search to results (s)", lambda t: t["results_s"]),
+        ("results DOMContentLoaded (ms)", lambda t: t["results_page"]["dom_content_loaded_ms"]),
+        ("results load event (ms)", lambda t: t["results_page"]["load_ms"]),
+        ("results transfer (KB)", lambda t: t["results_page"]["transfer_kb"]),
+        ("read cards (s)", lambda t: t["cards_s"]),
+        ("fees (s)", lambda t: t["fees_s"]),
+    ]
+    profiles = list(timings_by_profile)
+    print(f"{'':<32}" + "".join(f"{p:>12}" for p in profiles))
+    for label, get in lines:
+        cells = []
+        for p in profiles:
+            value = mean([get(t) for t in timings_by_profile[p]])
+            cells.append(f"{'-':>12}" if value is None else f"{value:>12.2f}")
+        print(f"{label:<32}" + "".join(cells))
+
+def run_jobs(queries, workers=2, limit=10, headless=True, profile="lean", **options):
+    """Scrape (city, specialty) queries on a pool of long-lived browsers.
+
+    Each worker starts its browser once and serves queries from a shared
+    queue until it is empty; a browser whose session is lost is replaced,
+    while a query that merely times out keeps it. Practitioners are
+    deduplicated across queries on (Nom, Spécialité); a failed query gives
+    its claims back, so another query can still return them. Yields rows as
+    each query completes. `options` are passed on to run_query.
+    """
+    jobs = queue.Queue()
+    for q in queries:
+        jobs.put(q)
+    results = queue.Queue()
+    seen = set()
+    seen_lock = threading.Lock()
+
+    def claimer(claimed):
+        def claim(key):
+            with seen_lock:
+                if key in seen:
+                    return False
+                seen.add(key)
+            claimed.append(key)
+            return True
+        return claim
+
+    def release(claimed):
+        with seen_lock:
+            seen.difference_update(claimed)
+
+    def worker():
+        driver = None
+        try:
+            while True:
+                try:
+                    city, specialty = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                claimed = []
+                try:
+                    if driver is None:
+                        with metrics.timer("webdriver_step_seconds", step="start_browser"):
+                            driver = new_driver(headless, profile)
+                    rows = run_query(driver, city, specialty, limit, claimer(claimed), **options)
+                    metrics.inc("doctolib_queries_total", outcome="ok")
+                    results.put(((city, specialty), rows, None))
+                except Exception as e:
+                    release(claimed)
+                    metrics.inc("doctolib_queries_total", outcome=type(e).__name__)
+                    results.put(((city, specialty), [], e))
+                    if driver is not None and (isinstance(e, InvalidSessionIdException) or not session_alive(driver)):
+                        try:
+                            driver.quit()
+                        except WebDriverException:
+                            pass
+                        driver = None
+        finally:
+            if driver is not None:
+                driver.quit()
+            results.put(None)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(workers, len(queries))))]
+    for t in threads:
+        t.start()
+    running = len(threads)
+    while running:
+        item = results.get()
+        if item is None:
+            running -= 1
+            continue
+        query, rows, error = item
+        if error:
+            print(f"Query {query} failed: {error}")
+        yield from rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape Doctolib search results for many (city, specialty) queries.")
+    parser.add_argument("--city", action="append", help="repeatable (default: Montpellier)")
+    parser.add_argument("--specialty", action="append", help="repeatable; every city is searched for every specialty")
+    parser.add_argument("--queries", help="CSV file of city,specialty lines, instead of --city/--specialty")
+    parser.add_argument("--workers", type=int, default=1, help="number of browsers in the pool")
+    parser.add_argument("--limit", type=int, default=10, help="rows per query")
+    parser.add_argument("--output", default="doctolib_results.csv")
+    parser.add_argument("--db", help="also upsert the rows into this SQLite store")
+    parser.add_argument("--headed", action="store_true", help="show the browser windows")
+    parser.add_argument("--fees-mode", choices=["tabs", "http"], default=FEES_MODE)
+    parser.add_argument("--fees-concurrency", type=int, default=FEES_CONCURRENCY)
+    parser.add_argument("--profile", choices=["lean", "full"], default="lean",
+                        help="lean: no images/fonts/trackers, eager page loads; full: a regular browser")
+    parser.add_argument("--timeout", type=int, default=30, help="seconds to wait for each DOM condition")
+    parser.add_argument("--timing", action="store_true", help="print a page-load timing report")
+    parser.add_argument("--compare-profiles", action="store_true",
+                        help="run the first query with the full and lean profiles and compare timings")
+    parser.add_argument("--cards-mode", choices=list(CARD_READERS), default=CARDS_MODE,
+                        help="js: one execute_script per page; lxml: parse page_source once; webdriver: per-field calls")
+    args = parser.parse_args()
+    metrics.setup_from_env()
+
+    if args.queries:
+        with open(args.queries, newline="", encoding="utf-8") as f:
+            queries = [(r[0].strip(), r[1].strip() if len(r) > 1 else "") for r in csv.reader(f) if r]
+    else:
+        queries = list(itertools.product(args.city or ["Montpellier"], args.specialty or [""]))
+
+    options = dict(fees_mode=args.fees_mode, fees_concurrency=args.fees_concurrency,
+                   cards_mode=args.cards_mode, timeout=args.timeout)
+
+    if args.compare_profiles:
+        report = {}
+        for profile in ("full", "lean"):
+            report[profile] = []
+            for _ in run_jobs(queries[:1], 1, args.limit, not args.headed, profile, timings=report[profile], **options):
+                pass
+        print_timing_report(report)
+        return
+
+    # Rows are appended and flushed as each query finishes
+    timings = []
+    written = 0
+    store = PractitionerStore(args.db) if args.db else None
+    pending = []
+    with open(args.output, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for row in run_jobs(queries, args.workers, args.limit, not args.headed, args.profile,
+                            timings=timings, **options):
+            with metrics.timer("scrape_stage_seconds", stage="write"):
+                writer.writerow(row)
+                out.flush()
+            written += 1
+            if store:
+                pending.append(row)
+                if len(pending) >= 100:
+                    store.upsert(pending)
+                    pending = []
+    if store:
+        store.upsert(pending)
+        store.close()
+    print(f"Wrote {written} rows to {args.output}" + (f" and {args.db}" if store else ""))
+    if args.timing:
+        print_timing_report({args.profile: timings})
+
+if __name__ == "__main__":
+    main()
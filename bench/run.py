@@ -0,0 +1,304 @@
+"""Offline benchmarks for the J1 scrapers and the TP2 Flask filter.
+
+Everything runs against recorded fixtures served by a local HTTP server,
+so no live site is touched:
+
+    python bench/run.py                       # all scenarios
+    python bench/run.py extract articles --articles 2000 --latency 0.02
+    python bench/run.py --save baseline.json
+    python bench/run.py --compare baseline.json --tolerance 0.15
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "J1"), os.path.join(ROOT, "TP2"), os.path.dirname(os.path.abspath(__file__))]
+
+from server import FixtureServer, FIXTURES
+import http_client
+import extraction
+from batch import run_batch
+import blog_moderateur_scraper
+import main_page
+import images
+from dedup import NearDuplicateIndex
+from crawl_state import CrawlState
+import discovery
+import metrics
+import reextract
+
+logging.disable(logging.WARNING)
+
+def percentiles(samples):
+    """p50/p90/p99 of a list of seconds, in milliseconds."""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"p50_ms": round(pick(0.50), 3), "p90_ms": round(pick(0.90), 3), "p99_ms": round(pick(0.99), 3)}
+
+def bench_extract(args, server):
+    pages = []
+    for name in sorted(os.listdir(FIXTURES)):
+        if name.startswith("article"):
+            with open(os.path.join(FIXTURES, name), "rb") as f:
+                pages.append(f.read())
+    parse, extract = [], []
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        page = pages[i % len(pages)]
+        t0 = time.perf_counter()
+        doc = extraction.parse_html(page, "utf-8")
+        t1 = time.perf_counter()
+        extraction.extract_fields(doc, "http://bench/article/")
+        t2 = time.perf_counter()
+        parse.append(t1 - t0)
+        extract.append(t2 - t1)
+    elapsed = time.perf_counter() - start
+    return {"pages": args.repeat, "pages_per_sec": round(args.repeat / elapsed, 1),
+            "stages": {"parse": percentiles(parse), "extract": percentiles(extract)}}
+
+def bench_articles(args, server):
+    urls = [f"{server.base_url}/article/{i}/" for i in range(args.articles)]
+    columns = blog_moderateur_scraper.COLUMNS
+    fetch_times, extract_times = [], []
+
+    def timed(url):
+        t0 = time.perf_counter()
+        response = http_client.fetch(url)
+        t1 = time.perf_counter()
+        extraction.extract_article(response.text, url, columns)
+        t2 = time.perf_counter()
+        fetch_times.append(t1 - t0)
+        extract_times.append(t2 - t1)
+
+    start = time.perf_counter()
+    errors = sum(1 for _, _, error in run_batch(timed, urls, args.concurrency) if error)
+    elapsed = time.perf_counter() - start
+    return {"pages": len(urls), "errors": errors, "pages_per_sec": round(len(urls) / elapsed, 1),
+            "stages": {"fetch": percentiles(fetch_times), "extract": percentiles(extract_times)}}
+
+def bench_pipeline(args, server):
+    urls = [f"{server.base_url}/article/{i}/" for i in range(args.articles)]
+    start = time.perf_counter()
+    errors = sum(1 for _, _, error in blog_moderateur_scraper.scrape_bdm_articles(
+        urls, args.concurrency, parse_workers=args.parse_workers or os.cpu_count(), batch_size=args.batch_size) if error)
+    elapsed = time.perf_counter() - start
+    return {"pages": len(urls), "errors": errors, "pages_per_sec": round(len(urls) / elapsed, 1)}
+
+def bench_dedup(args, server):
+    urls = [f"{server.base_url}/article/{i}/" for i in range(args.articles)]
+    index = NearDuplicateIndex()
+    start = time.perf_counter()
+    results = list(blog_moderateur_scraper.scrape_bdm_articles(
+        urls, args.concurrency, parse_workers=args.parse_workers or os.cpu_count(), batch_size=args.batch_size,
+        dedup=index))
+    elapsed = time.perf_counter() - start
+    return {"pages": len(urls), "errors": sum(1 for r in results if r[2]), "indexed": len(index),
+            "duplicates": sum(1 for r in results if r[1] and "duplicate_of" in r[1]),
+            "pages_per_sec": round(len(urls) / elapsed, 1)}
+
+def _counter(name):
+    return sum(c["value"] for c in metrics.snapshot()["counters"] if c["name"] == name)
+
+def bench_discover(args, server):
+    """A first discovery run scrapes everything, a second one only the articles modified in between."""
+    main_page.BASE_URL = server.base_url
+    sources = main_page.discovery_sources()
+    with tempfile.TemporaryDirectory() as tmp:
+        state = CrawlState(os.path.join(tmp, "crawl_state.sqlite"))
+        xml_bytes = _counter("discovery_bytes_total")
+        start = time.perf_counter()
+        first = list(blog_moderateur_scraper.scrape_bdm_articles(
+            discovery.discover_updated(sources, state), args.concurrency, state=state))
+        elapsed = time.perf_counter() - start
+        xml_bytes = _counter("discovery_bytes_total") - xml_bytes
+        server.modified.update({n: time.time() + 60 for n in (1, 2, 3)})
+        start = time.perf_counter()
+        updated = list(discovery.discover_updated(sources, state))
+        rediscover_ms = (time.perf_counter() - start) * 1000
+        state.close()
+        server.modified.clear()
+    return {"pages": len(first), "errors": sum(1 for r in first if r[2]), "pages_per_sec": round(len(first) / elapsed, 1),
+            "xml_kb": round(xml_bytes / 1024, 1),
+            "listing_kb": round(server.archive_pages * len(server.archive_page(1)) / 1024, 1),
+            "updated": len(updated), "rediscover_ms": round(rediscover_ms, 1)}
+
+def bench_reextract(args, server):
+    """Crawl the section into an archive, then rebuild the rows from it offline."""
+    main_page.BASE_URL = server.base_url
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "archive.warc.gz")
+        received = _counter("http_received_bytes_total")
+        http_client.enable_archive(path)
+        try:
+            list(main_page.crawl_bdm_section("web", concurrency=args.concurrency))
+        finally:
+            http_client.disable_archive()
+        received = _counter("http_received_bytes_total") - received
+        start = time.perf_counter()
+        rows, errors = reextract.reextract(path, os.path.join(tmp, "rows.jsonl"), args.parse_workers)
+        elapsed = time.perf_counter() - start
+        archived = os.path.getsize(path)
+    return {"pages": rows, "errors": errors, "pages_per_sec": round(rows / elapsed, 1),
+            "html_kb": round(received / 1024, 1), "archive_kb": round(archived / 1024, 1)}
+
+def bench_crawl(args, server):
+    main_page.BASE_URL = server.base_url
+    start = time.perf_counter()
+    results = list(main_page.crawl_bdm_section("web", concurrency=args.concurrency))
+    elapsed = time.perf_counter() - start
+    pages = len(results) + server.archive_pages
+    return {"pages": pages, "errors": sum(1 for r in results if r[2]), "pages_per_sec": round(pages / elapsed, 1)}
+
+def bench_images(args, server):
+    records = [{"url": f"{server.base_url}/article/{i}/",
+                "images": "|".join(f"{server.base_url}/wp-content/uploads/{i}-{k}.jpg" for k in range(4))}
+               for i in range(args.articles)]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        downloaded, _, errors = images.download_images(records, tmp, os.path.join(tmp, "manifest.jsonl"),
+                                                       args.concurrency)
+        elapsed = time.perf_counter() - start
+        stored = sum(len(files) for _, _, files in os.walk(tmp)) - 1  # minus the manifest
+        with open(os.path.join(tmp, "manifest.jsonl")) as f:
+            size = sum(json.loads(line)["bytes"] or 0 for line in f)
+    return {"images": downloaded, "errors": errors, "stored_files": stored, "images_per_sec": round(downloaded / elapsed, 1),
+            "mb_per_sec": round(size / 2**20 / elapsed, 1)}
+
+def make_doctolib_csv(path, rows, seed=0):
+    """Write a synthetic Doctolib export with the scraper's columns."""
+    r = random.Random(seed)
+    specialties = ["Médecin généraliste", "Dermatologue", "Pédiatre", "Cabinet médical", "Centre de santé",
+                   "Ophtalmologue", "Gynécologue", "Chirurgien-dentiste", "Kinésithérapeute", "Psychiatre"]
+    cities = ["38000 Grenoble", "34000 Montpellier", "75011 Paris", "69003 Lyon", "13001 Marseille", "33000 Bordeaux"]
+    streets = ["Rue Jean Macé", "Avenue des Martyrs", "Boulevard Maréchal Foch", "Rue de la République", "Place Victor Hugo"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Nom", "Spécialité", "Adresse", "Assurance", "Disponibilités", "Type de consultation", "Tarifs"])
+        for i in range(rows):
+            street = f"{r.randint(1, 200)} {r.choice(streets)}"
+            fee = r.random()
+            tarifs = ("Indisponible" if fee < 0.5 else
+                      f"Consultation: {r.randint(25, 80)} €" if fee < 0.8 else
+                      f"Acte technique: {r.randint(50, 250)} € à {r.randint(260, 400)} €")
+            writer.writerow([f"Dr {i} {r.choice(['MARTIN', 'BERNARD', 'DUBOIS', 'LEVY'])}", r.choice(specialties),
+                             f"{street}, {r.choice(cities)}", street,
+                             " | ".join(f"{r.randint(8, 19):02d}:{r.choice(['00', '15', '30', '45'])}" for _ in range(r.randint(0, 8))),
+                             r.choice(["Présentiel", "Présentiel", "Visio"]), tarifs])
+
+FLASK_QUERIES = [
+    {},
+    {"specialty": "médecin"},
+    {"specialty": "dermato", "address_include": "grenoble"},
+    {"assurance": "rue", "address_exclude": "paris", "consultation_type": "présentiel"},
+    {"min_price": "30", "max_price": "300"},
+]
+
+def bench_flask(args, server):
+    import app as doctolib_app
+    from scheduler import ScrapeScheduler
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "doctolib_results.csv")
+        make_doctolib_csv(path, args.rows)
+        doctolib_app.scheduler = ScrapeScheduler(doctolib_app.SCRAPER_SCRIPT, os.path.join(tmp, "snapshots"),
+                                                 interval=10**9)
+        doctolib_app.scheduler.publish(path)
+        client = doctolib_app.app.test_client()
+        latencies = []
+        start = time.perf_counter()
+        for i in range(args.requests):
+            t0 = time.perf_counter()
+            response = client.post("/", data=FLASK_QUERIES[i % len(FLASK_QUERIES)])
+            latencies.append(time.perf_counter() - t0)
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - start
+    return {"rows": args.rows, "requests": args.requests, "requests_per_sec": round(args.requests / elapsed, 1),
+            "stages": {"request": percentiles(latencies)}}
+
+SCENARIOS = {
+    "extract": bench_extract,
+    "articles": bench_articles,
+    "pipeline": bench_pipeline,
+    "crawl": bench_crawl,
+    "discover": bench_discover,
+    "reextract": bench_reextract,
+    "images": bench_images,
+    "dedup": bench_dedup,
+    "flask": bench_flask,
+}
+
+def run(args):
+    results = {}
+    if args.polite:
+        http_client.enable_politeness(max_concurrency=args.concurrency, backoff_base=0.05)
+    with FixtureServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       archive_pages=args.archive_pages) as server:
+        for name in args.scenarios or list(SCENARIOS):
+            if args.memory:
+                tracemalloc.start()
+            result = SCENARIOS[name](args, server)
+            if args.memory:
+                result["peak_mem_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+                tracemalloc.stop()
+            results[name] = result
+            print(f"{name:<10} {json.dumps(result, ensure_ascii=False)}")
+    return results
+
+def compare(results, baseline, tolerance):
+    """Names of the scenarios whose throughput dropped more than `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        for key in ("pages_per_sec", "requests_per_sec", "images_per_sec"):
+            if key in result and key in baseline.get(name, {}):
+                before, after = baseline[name][key], result[key]
+                if after < before * (1 - tolerance):
+                    regressions.append(f"{name}: {key} {before} -> {after}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--archive-pages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=300, help="pages parsed by the extract scenario")
+    parser.add_argument("--rows", type=int, default=20000, help="rows in the synthetic Doctolib CSV")
+    parser.add_argument("--requests", type=int, default=50, help="requests sent to the Flask filter")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--polite", action="store_true", help="fetch through the per-host politeness scheduler")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip tracemalloc, which slows the scenarios down")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to check for throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    results = run(args)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+EPOCH = 1704067200  # 2024-01-01, lastmod of /article/0/
+
+def _w3c(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+class FixtureServer:
+    """Local stand-in for blogdumoderateur.com serving recorded pages.
+
+    /article/<n>/ replays the article fixtures round-robin, so any number of
+    distinct article URLs can be requested. /<section>/ and
+    /<section>/page/<k>/ replay the archive fixture with its article links
+    shifted to page k; pages past `archive_pages` return 404. Any .jpg path
+    returns one of `image_variants` synthetic images of ~`image_size` bytes,
+    picked by a hash of the path, so distinct URLs share content.
+    /sitemap_index.xml lists one /post-sitemap<k>.xml per archive page and
+    /feed/ (or /<section>/feed/) is an RSS feed of the first page; article n
+    was last modified at EPOCH + n minutes unless `modified[n]` says
+    otherwise. Every response
+    waits `latency` (+ up to `jitter`) seconds, and a `error_rate` fraction
+    of them fail with 503, carrying `retry_after` as Retry-After if set.
+    /robots.txt serves `robots` (404 when None).
+    """
+
+    def __init__(self, fixtures=FIXTURES, latency=0.0, jitter=0.0, error_rate=0.0, archive_pages=5, seed=0,
+                 image_variants=8, image_size=48 * 1024, robots=None, retry_after=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.archive_pages = archive_pages
+        self.robots = robots
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.articles = []
+        for name in sorted(os.listdir(fixtures)):
+            with open(os.path.join(fixtures, name), "rb") as f:
+                if name.startswith("article"):
+                    self.articles.append(f.read())
+                elif name == "archive.html":
+                    self.archive = f.read().decode("utf-8")
+        self.per_page = len(re.findall(r'href="/article/\d+/"', self.archive))
+        images = random.Random(seed)
+        self.images = [images.randbytes(image_size + i * 1024) for i in range(image_variants)]
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+        self.modified = {}
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def archive_page(self, page):
+        offset = (page - 1) * self.per_page
+        return re.sub(r'href="/article/(\d+)/"',
+                      lambda m: f'href="/article/{int(m.group(1)) + offset}/"', self.archive).encode("utf-8")
+
+    def lastmod(self, n):
+        return self.modified.get(n, EPOCH + n * 60)
+
+    def _page_articles(self, page):
+        return range((page - 1) * self.per_page, page * self.per_page)
+
+    def sitemap_index(self):
+        entries = "".join(
+            f"<sitemap><loc>{self.base_url}/post-sitemap{k}.xml</loc>"
+            f"<lastmod>{_w3c(max(self.lastmod(n) for n in self._page_articles(k)))}</lastmod></sitemap>"
+            for k in range(1, self.archive_pages + 1))
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>').encode()
+
+    def sitemap(self, page):
+        entries = "".join(f"<url><loc>{self.base_url}/article/{n}/</loc><lastmod>{_w3c(self.lastmod(n))}</lastmod></url>"
+                          for n in self._page_articles(page))
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>').encode()
+
+    def feed(self):
+        items = "".join(f"<item><title>Article {n}</title><link>{self.base_url}/article/{n}/</link>"
+                        f"<pubDate>{formatdate(self.lastmod(n), usegmt=True)}</pubDate></item>"
+                        for n in self._page_articles(1))
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f'<title>Fixtures</title><link>{self.base_url}/</link>{items}</channel></rss>').encode()
+
+    def route(self, path):
+        m = re.fullmatch(r"/article/(\d+)/", path)
+        if m:
+            return self.articles[int(m.group(1)) % len(self.articles)]
+        if path == "/robots.txt":
+            return None if self.robots is None else self.robots.encode()
+        if path == "/sitemap_index.xml":
+            return self.sitemap_index()
+        m = re.fullmatch(r"/post-sitemap(\d+)\.xml", path)
+        if m:
+            return self.sitemap(int(m.group(1))) if 1 <= int(m.group(1)) <= self.archive_pages else None
+        if re.fullmatch(r"(?:/[\w-]+)?/feed/", path):
+            return self.feed()
+        m = re.fullmatch(r"/[\w-]+/(?:page/(\d+)/)?", path)
+        if m:
+            page = int(m.group(1) or 1)
+            if page <= self.archive_pages:
+                return self.archive_page(page)
+        return None
+
+    def _delay_and_fail(self):
+        with self._random_lock:
+            delay = self.latency + self._random.random() * self.jitter
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if server._delay_and_fail():
+                    headers = {"Retry-After": str(server.retry_after)} if server.retry_after is not None else {}
+                    self._send(503, b"injected error", headers=headers)
+                    return
+                path = self.path.split("?")[0]
+                if path.endswith(".jpg"):
+                    self._send(200, server.images[zlib.crc32(path.encode()) % len(server.images)], "image/jpeg")
+                    return
+                body = server.route(path)
+                if body is None:
+                    self._send(404, b"not found")
+                elif path.endswith((".xml", "/feed/")):
+                    self._send(200, body, "application/xml; charset=UTF-8")
+                else:
+                    self._send(200, body, "text/html; charset=UTF-8")
+
+            def _send(self, status, body, content_type="text/plain", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
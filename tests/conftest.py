@@ -0,0 +1,19 @@
+import csv
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Same layout as bench/run.py: the J1 and TP2 scripts import each other by module name
+sys.path[:0] = [os.path.join(ROOT, "J1"), os.path.join(ROOT, "TP2"), os.path.join(ROOT, "bench")]
+
+# Columns of the CSV snapshots written by TP2/test.py
+SNAPSHOT_FIELDS = ["Nom", "Spécialité", "Adresse", "Assurance", "Disponibilités", "Type de consultation", "Tarifs"]
+
+def write_snapshot(path, rows, assurance=""):
+    """Write a Doctolib snapshot CSV from (nom, specialty, address, price) tuples; returns its path."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(SNAPSHOT_FIELDS)
+        for nom, specialty, address, price in rows:
+            writer.writerow([nom, specialty, address, assurance, "", "Présentiel", price])
+    return str(path)
@@ -0,0 +1,50 @@
+import os
+from archive import WarcArchive
+
+PAGES = [(f"https://example.org/{i}/", f"<html><body>page {i}</body></html>".encode()) for i in range(5)]
+
+def fill(path, pages=PAGES):
+    with WarcArchive(path) as archive:
+        for url, body in pages:
+            archive.append(url, 200, {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip"}, body)
+    return os.path.getsize(path)
+
+def test_get_returns_the_latest_capture(tmp_path):
+    path = str(tmp_path / "a.warc.gz")
+    fill(path, PAGES + [(PAGES[0][0], b"<html>v2</html>")])
+    with WarcArchive(path) as archive:
+        response = archive.get(PAGES[0][0])
+        assert response.body == b"<html>v2</html>" and response.status == 200
+        assert "Content-Encoding" not in response.headers
+        assert archive.get("https://example.org/missing/") is None
+        assert len(archive) == 6 and len(archive.entries(latest=True)) == 5
+
+def test_torn_tail_is_cut_back_on_the_next_append(tmp_path):
+    path = str(tmp_path / "a.warc.gz")
+    size = fill(path)
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00torn")
+    fill(path, [("https://example.org/after/", b"<html>after</html>")])
+    with WarcArchive(path) as archive:
+        assert [r.url for r in archive] == [url for url, _ in PAGES] + ["https://example.org/after/"]
+        assert archive.entries(latest=False)[-1]["offset"] == size
+
+def test_entry_past_the_end_of_the_archive_is_dropped(tmp_path):
+    path = str(tmp_path / "a.warc.gz")
+    fill(path)
+    with WarcArchive(path) as archive:
+        last = archive.entries(latest=False)[-1]
+    with open(path, "rb+") as f:
+        f.truncate(int(last["offset"]) + 10)  # crash in the middle of the last record
+    with WarcArchive(path) as archive:
+        archive.append("https://example.org/after/", 200, {}, b"after")
+        assert [r.url for r in archive] == [url for url, _ in PAGES[:-1]] + ["https://example.org/after/"]
+
+def test_missing_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / "a.warc.gz")
+    fill(path)
+    os.remove(path + ".idx")
+    with WarcArchive(path) as archive:
+        archive.append("https://example.org/after/", 200, {}, b"after")
+        assert archive.get(PAGES[2][0]).body == PAGES[2][1]
+        assert len(archive) == 6
@@ -0,0 +1,24 @@
+import pytest
+from conftest import write_snapshot
+from dataset import Dataset
+
+@pytest.fixture
+def dataset(tmp_path):
+    rows = [("A", "Dentiste", "1 rue X", "25 €"), ("B", "Dentiste", "2 rue X", "30 €"),
+            ("C", "Généraliste", "3 rue X", "25 €"), ("D", "Généraliste", "4 rue X", ""),
+            ("E", "Dentiste", "5 rue X", "30 €")]
+    return Dataset(write_snapshot(tmp_path / "snapshot.csv", rows))
+
+def names(dataset, **kwargs):
+    return [r["Nom"] for r in dataset.records(dataset.filter(**kwargs))]
+
+def test_price_ties_keep_file_order_in_both_directions(dataset):
+    assert names(dataset, sort="price") == ["A", "C", "B", "E", "D"]
+    assert names(dataset, sort="price", descending=True) == ["B", "E", "A", "C", "D"]
+
+def test_text_ties_keep_file_order_descending(dataset):
+    assert names(dataset, sort="specialty", descending=True) == ["C", "D", "A", "B", "E"]
+
+def test_unknown_sort_key(dataset):
+    with pytest.raises(ValueError):
+        dataset.filter(sort="tarif")
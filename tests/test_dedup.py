@@ -0,0 +1,46 @@
+from dedup import NearDuplicateIndex, filter_duplicates
+
+TEXT = " ".join(f"mot{i} de l'article sur le référencement naturel" for i in range(60))
+OTHER = " ".join(f"terme{i} d'un billet consacré aux réseaux sociaux" for i in range(60))
+
+def signature(index, text):
+    return index.signatures([text])[0]
+
+def test_rescraped_page_is_not_its_own_duplicate():
+    index = NearDuplicateIndex()
+    assert index.check("/a/", signature(index, TEXT)) is None
+    assert index.check("/a/", signature(index, TEXT)) is None
+    assert index.check("/a/", signature(index, TEXT + " mise à jour")) is None
+    assert len(index) == 1
+
+def test_copy_under_another_url_matches():
+    index = NearDuplicateIndex()
+    index.check("/a/", signature(index, TEXT))
+    key, similarity = index.check("/copie/", signature(index, TEXT))
+    assert key == "/a/" and similarity == 1.0
+    assert len(index) == 1
+
+def test_replaced_signature_leaves_no_stale_bands():
+    index = NearDuplicateIndex()
+    index.check("/a/", signature(index, TEXT))
+    index.check("/a/", signature(index, OTHER))
+    assert index.query(signature(index, TEXT)) is None
+    assert index.query(signature(index, OTHER))[0] == "/a/"
+
+def test_save_and_load_round_trip(tmp_path):
+    index = NearDuplicateIndex(threshold=0.7)
+    index.check("/a/", signature(index, TEXT))
+    index.check("/b/", signature(index, OTHER))
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = NearDuplicateIndex.load(path, suppress=True)
+    assert len(loaded) == 2 and loaded.threshold == 0.7 and loaded.suppress
+    assert loaded.query(signature(loaded, TEXT))[0] == "/a/"
+    assert loaded.check("/b/", signature(loaded, OTHER)) is None
+
+def test_suppressed_duplicates_are_reported():
+    index = NearDuplicateIndex(suppress=True)
+    dropped = []
+    results = [("/a/", {"text": TEXT}, None), ("/copie/", {"text": TEXT}, None), ("/b/", {"text": OTHER}, None)]
+    kept = [url for url, _, _ in filter_duplicates(results, index, dropped.append)]
+    assert kept == ["/a/", "/b/"] and dropped == ["/copie/"]
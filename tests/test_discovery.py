@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+import pytest
+import discovery
+from crawl_state import CrawlState
+from discovery import discover, discover_updated, parse_date
+
+BASE = "https://example.org"
+OLD, NEW = "Mon, 01 Jan 2024 08:00:00 +0000", "2024-03-01T08:00:00+00:00"
+
+def feed(*items):
+    return ("<rss><channel>" + "".join(f"<item><link>{BASE}{path}</link><pubDate>{date}</pubDate></item>"
+                                       for path, date in items) + "</channel></rss>")
+
+def sitemap(*urls):
+    return ('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + "".join(f"<url><loc>{BASE}{path}</loc><lastmod>{date}</lastmod></url>" for path, date in urls)
+            + "</urlset>")
+
+def index(*sitemaps):
+    return ('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + "".join(f"<sitemap><loc>{BASE}{path}</loc><lastmod>{date}</lastmod></sitemap>" for path, date in sitemaps)
+            + "</sitemapindex>")
+
+@pytest.fixture
+def site(monkeypatch):
+    documents = {}
+
+    def fetch(url, headers=None):
+        return SimpleNamespace(status_code=200, content=documents[url].encode("utf-8"), headers={})
+
+    monkeypatch.setattr(discovery, "fetch", fetch)
+    return documents
+
+def test_latest_date_wins_across_feed_and_sitemap(site):
+    site[f"{BASE}/feed/"] = feed(("/a/", OLD), ("/b/", "Fri, 01 Mar 2024 09:00:00 +0000"))
+    site[f"{BASE}/sitemap.xml"] = sitemap(("/a/", NEW), ("/b/", "2024-01-01"), ("/c/", NEW))
+    dates = dict(discover([f"{BASE}/feed/", f"{BASE}/sitemap.xml"]))
+    assert dates == {f"{BASE}/a/": parse_date(NEW), f"{BASE}/b/": parse_date("2024-03-01T09:00:00Z"),
+                     f"{BASE}/c/": parse_date(NEW)}
+
+def test_unscraped_urls_are_retried_after_the_sitemap_was_read(site, tmp_path):
+    site[f"{BASE}/sitemap_index.xml"] = index(("/post-sitemap.xml", NEW))
+    site[f"{BASE}/post-sitemap.xml"] = sitemap(("/a/", NEW), ("/b/", NEW), ("/c/", NEW))
+    sources = [f"{BASE}/sitemap_index.xml"]
+    state = CrawlState(str(tmp_path / "state.sqlite"))
+    try:
+        first = discover_updated(sources, state)
+        state.record_fetch(next(first), {})
+        first.close()  # run killed after one article
+        assert state.last_fetched(f"{BASE}/post-sitemap.xml") is not None
+        assert list(discover_updated(sources, state)) == [f"{BASE}/b/", f"{BASE}/c/"]
+    finally:
+        state.close()
@@ -0,0 +1,62 @@
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException
+import test as doctolib
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_calls = 0
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise InvalidSessionIdException("session deleted")
+        return "about:blank"
+
+    def quit(self):
+        self.quit_calls += 1
+
+@pytest.fixture
+def drivers(monkeypatch):
+    started = []
+
+    def new_driver(headless=True, profile="lean"):
+        started.append(FakeDriver())
+        return started[-1]
+
+    monkeypatch.setattr(doctolib, "new_driver", new_driver)
+    return started
+
+def row(name):
+    return {"Nom": name, "Spécialité": "Dentiste"}
+
+def fake_query(outcomes):
+    """run_query stand-in: claims the names listed for the query, then fails with its exception, if any."""
+    def run_query(driver, city, specialty, limit, claim, **options):
+        names, error = outcomes[city]
+        rows = [row(n) for n in names if claim((n, "Dentiste"))]
+        if error == "crash":
+            driver.alive = False
+            raise InvalidSessionIdException("chrome not reachable")
+        if error:
+            raise error
+        return rows
+    return run_query
+
+def test_timeout_keeps_the_browser_and_releases_claims(drivers, monkeypatch):
+    monkeypatch.setattr(doctolib, "run_query", fake_query({
+        "Lyon": (["A", "B"], TimeoutException("total-number-of-results")),
+        "Paris": (["A", "B", "C"], None),
+    }))
+    rows = list(doctolib.run_jobs([("Lyon", ""), ("Paris", "")], workers=1))
+    assert [r["Nom"] for r in rows] == ["A", "B", "C"]
+    assert len(drivers) == 1 and drivers[0].quit_calls == 1  # only at the end
+
+def test_lost_session_replaces_the_browser(drivers, monkeypatch):
+    monkeypatch.setattr(doctolib, "run_query", fake_query({
+        "Lyon": (["A"], "crash"),
+        "Paris": (["A"], None),
+    }))
+    rows = list(doctolib.run_jobs([("Lyon", ""), ("Paris", "")], workers=1))
+    assert [r["Nom"] for r in rows] == ["A"]
+    assert len(drivers) == 2 and [d.quit_calls for d in drivers] == [1, 1]
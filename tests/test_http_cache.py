@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import http_client
+from http_cache import HttpCache
+
+class Origin:
+    """Local server with an ETag per path, answering If-None-Match with 304."""
+
+    def __init__(self):
+        self.statuses = []
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                etag = f'"{self.path}-v1"'
+                status = 304 if self.headers.get("If-None-Match") == etag else 200
+                origin.statuses.append(status)
+                body = b"" if status == 304 else f"<html>{self.path}</html>".encode()
+                self.send_response(status)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+@pytest.fixture
+def origin():
+    origin = Origin()
+    yield origin
+    origin.stop()
+
+@pytest.fixture
+def cache(tmp_path):
+    def enable(**options):
+        return http_client.enable_cache(str(tmp_path / "cache"), **options)
+    yield enable
+    http_client.disable_cache()
+
+def test_304_reuses_the_cached_body(origin, cache):
+    cache()
+    first = http_client.fetch(f"{origin.base_url}/a/")
+    second = http_client.fetch(f"{origin.base_url}/a/")
+    assert origin.statuses == [200, 304]
+    assert second.content == first.content == b"<html>/a/</html>"
+    assert second.from_cache and not first.from_cache
+
+def test_ttl_serves_the_entry_without_a_request(origin, cache):
+    cache(ttl=60)
+    http_client.fetch(f"{origin.base_url}/a/")
+    assert http_client.fetch(f"{origin.base_url}/a/").content == b"<html>/a/</html>"
+    assert origin.statuses == [200]
+
+def test_eviction_past_max_bytes_drops_the_least_recently_used(tmp_path):
+    cache = HttpCache(str(tmp_path / "cache"), max_bytes=250)
+    for url in ("/a/", "/b/"):
+        cache.store(url, {}, b"x" * 100)
+        time.sleep(0.01)
+    cache.load(cache.lookup("/a/"))  # /a/ is now the most recently used
+    time.sleep(0.01)
+    b_path = cache._path(cache.lookup("/b/")["key"])
+    cache.store("/c/", {}, b"x" * 100)
+    assert cache.lookup("/b/") is None and not os.path.exists(b_path)
+    assert cache.lookup("/a/") is not None and cache.lookup("/c/") is not None
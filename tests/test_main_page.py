@@ -0,0 +1,27 @@
+import csv
+import pytest
+import main_page
+from dedup import NearDuplicateIndex
+from server import FixtureServer
+
+@pytest.fixture
+def server(monkeypatch):
+    with FixtureServer(archive_pages=1) as server:
+        monkeypatch.setattr(main_page, "BASE_URL", server.base_url)
+        yield server
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def test_flagged_duplicates_reach_the_output(server, tmp_path):
+    output = str(tmp_path / "crawl.csv")
+    count = main_page.crawl_to_file("web", output, concurrency=4, dedup=NearDuplicateIndex())
+    rows = read_csv(output)
+    assert len(rows) == count == server.per_page
+    assert sum(1 for row in rows if row["duplicate_of"]) == count - len(server.articles)
+
+def test_without_dedup_the_columns_are_unchanged(server, tmp_path):
+    output = str(tmp_path / "crawl.csv")
+    main_page.crawl_to_file("web", output, concurrency=4)
+    assert list(read_csv(output)[0]) == main_page.CRAWL_FIELDS
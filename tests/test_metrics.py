@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from conftest import ROOT
+
+def test_tp2_shares_the_j1_module():
+    import metrics
+    import dataset
+    import scheduler
+    assert dataset.metrics is metrics and scheduler.metrics is metrics
+    assert os.path.samefile(metrics.__file__, os.path.join(ROOT, "J1", "metrics.py"))
+
+def _record_in_child():
+    import metrics
+    metrics.inc("child_total")
+    return metrics.REGISTRY.drain()
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="fork only")
+def test_forked_child_does_not_inherit_a_held_lock():
+    import metrics
+    metrics.inc("parent_total")
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"))
+    try:
+        with metrics.REGISTRY._lock:  # another thread is recording when the pool forks
+            future = pool.submit(_record_in_child)
+        counters, _ = future.result(timeout=10)
+    except Exception:
+        for process in multiprocessing.active_children():
+            process.kill()
+        raise
+    finally:
+        pool.shutdown(wait=False)
+    assert list(counters.values()) == [1]
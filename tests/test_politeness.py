@@ -0,0 +1,80 @@
+import threading
+import time
+import pytest
+import requests
+from politeness import CircuitOpen, Politeness, RobotsDisallowed
+from server import FixtureServer
+
+@pytest.fixture
+def server():
+    with FixtureServer(archive_pages=1) as server:
+        yield server
+
+def polite(**options):
+    options.setdefault("respect_robots", False)
+    options.setdefault("backoff_base", 0)
+    return Politeness(requests.Session(), **options)
+
+def stats(politeness, server):
+    return politeness.stats()[server.base_url.split("//")[1]]
+
+def test_throttling_halves_the_limit_and_successes_raise_it(server):
+    politeness = polite(initial_concurrency=8, max_retries=0, failure_threshold=100)
+    server.error_rate = 1.0
+    assert politeness.get(f"{server.base_url}/article/1/").status_code == 503
+    assert stats(politeness, server)["limit"] == 4
+    server.error_rate = 0.0
+    assert politeness.get(f"{server.base_url}/article/1/").status_code == 200
+    assert stats(politeness, server)["limit"] == 4.25
+
+def test_circuit_opens_after_the_threshold_then_lets_one_probe_through(server):
+    politeness = polite(max_retries=0, failure_threshold=3, cooldown=0.3, max_concurrency=4, initial_concurrency=4)
+    url = f"{server.base_url}/article/1/"
+    server.error_rate = 1.0
+    for _ in range(3):
+        assert politeness.get(url).status_code == 503
+    with pytest.raises(CircuitOpen):
+        politeness.get(url)
+    assert stats(politeness, server)["circuit"] == "open"
+    requests_before = stats(politeness, server)["requests"]
+
+    time.sleep(0.35)
+    outcomes = []
+
+    def get():
+        try:
+            outcomes.append(politeness.get(url).status_code)
+        except CircuitOpen:
+            outcomes.append("open")
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stats(politeness, server)["requests"] == requests_before + 1  # the single probe
+    assert sorted(outcomes, key=str) == [503, "open", "open", "open"]
+
+    time.sleep(0.65)  # the cooldown doubled after the failed probe
+    server.error_rate = 0.0
+    assert politeness.get(url).status_code == 200
+    assert stats(politeness, server)["circuit"] == "closed"
+
+def test_retry_after_is_honoured_up_to_backoff_max(server):
+    server.error_rate, server.retry_after = 1.0, 5
+    politeness = polite(max_retries=2, backoff_max=0.2, failure_threshold=100)
+    started = time.monotonic()
+    assert politeness.get(f"{server.base_url}/article/1/").status_code == 503
+    assert 0.4 <= time.monotonic() - started < 2
+    assert stats(politeness, server)["retries"] == 2
+
+def test_robots_disallow_and_crawl_delay(server):
+    server.robots = "User-agent: *\nDisallow: /private/\nCrawl-delay: 1\n"
+    politeness = polite(respect_robots=True)
+    with pytest.raises(RobotsDisallowed):
+        politeness.get(f"{server.base_url}/private/page/")
+    assert politeness.get(f"{server.base_url}/article/1/").status_code == 200
+    assert stats(politeness, server)["crawl_delay"] == 1
+
+    server.robots = "User-agent: *\nDisallow: /\n"  # cached for ROBOTS_TTL
+    assert politeness.allowed(f"{server.base_url}/article/2/")
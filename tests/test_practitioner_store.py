@@ -0,0 +1,46 @@
+import pytest
+from conftest import write_snapshot
+from dataset import Dataset
+from practitioner_store import PractitionerStore
+
+def snapshot(path, rows):
+    return write_snapshot(path, rows, assurance="Conventionné secteur 1")
+
+FIRST = [("A", "Dentiste", "1 rue de Paris, Lyon", "25 €"), ("B", "Dentiste", "2 rue de Lyon, Paris", "30 €"),
+         ("C", "Généraliste", "3 rue de Paris, Lyon", "")]
+SECOND = [("D", "Généraliste", "4 avenue Foch, Paris", "45 €"), ("B", "Dentiste", "2 rue de Lyon, Paris", "60 €"),
+          ("C", "Généraliste", "3 rue de Paris, Lyon", "25 €"), ("B", "Pédiatre", "9 rue Verte, Lyon", "40 €")]
+
+@pytest.fixture
+def store(tmp_path):
+    store = PractitionerStore(str(tmp_path / "store.sqlite"))
+    yield store
+    store.close()
+
+def rows(source, **kwargs):
+    return source.records(source.filter(**kwargs))
+
+def test_import_replaces_the_previous_snapshot(store, tmp_path):
+    store.import_csv(snapshot(tmp_path / "1.csv", FIRST))
+    assert store.import_csv(snapshot(tmp_path / "2.csv", SECOND)) == 4
+    assert len(store) == 4
+    assert [(r["Nom"], r["Spécialité"], r["Tarifs"]) for r in rows(store)] == [
+        ("D", "Généraliste", "45 €"), ("B", "Dentiste", "60 €"), ("C", "Généraliste", "25 €"), ("B", "Pédiatre", "40 €")]
+
+@pytest.mark.parametrize("query", [
+    {}, {"specialty": "dent"}, {"addr_inc": "paris"}, {"addr_exc": "lyon"}, {"min_price": 30}, {"max_price": 40},
+    {"sort": "price"}, {"sort": "price", "descending": True}, {"sort": "nom"}, {"sort": "specialty", "descending": True},
+])
+def test_store_matches_the_dataset_after_a_new_snapshot(store, tmp_path, query):
+    store.import_csv(snapshot(tmp_path / "1.csv", FIRST))
+    path = snapshot(tmp_path / "2.csv", SECOND)
+    store.import_csv(path)
+    assert rows(store, **query) == rows(Dataset(path), **query)
+
+def test_reopening_keeps_the_rows(store, tmp_path):
+    store.import_csv(snapshot(tmp_path / "1.csv", FIRST))
+    reopened = PractitionerStore(store.path)
+    try:
+        assert len(reopened) == 3
+    finally:
+        reopened.close()
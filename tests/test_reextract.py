@@ -0,0 +1,64 @@
+import csv
+import json
+import os
+import re
+from archive import WarcArchive
+from dedup import NearDuplicateIndex
+from reextract import reextract
+from server import FIXTURES
+
+BASE = "https://example.org"
+HTML = {"Content-Type": "text/html; charset=utf-8"}
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+def crawl_archive(path):
+    """An archive laid out like a live crawl: the listing page, then the articles it links to."""
+    listing = fixture("archive.html")
+    links = sorted({int(n) for n in re.findall(rb'href="/article/(\d+)/"', listing)})
+    articles = sorted(name for name in os.listdir(FIXTURES) if name.startswith("article"))
+    with WarcArchive(path) as archive:
+        archive.append(f"{BASE}/web/", 200, HTML, listing)
+        for n in links:
+            archive.append(f"{BASE}/article/{n}/", 200, HTML, fixture(articles[n % len(articles)]))
+    return len(links)
+
+def read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [{k: v for k, v in json.loads(line).items() if k != "scraped_at"} for line in f]
+
+def test_reextract_rebuilds_a_missing_index(tmp_path):
+    path = str(tmp_path / "crawl.warc.gz")
+    articles = crawl_archive(path)
+    expected = reextract(path, str(tmp_path / "first.jsonl"), workers=1)
+    os.remove(path + ".idx")
+    output = str(tmp_path / "rows.jsonl")
+    assert reextract(path, output, workers=1) == expected
+    assert expected[0] == articles and expected[1] == 0
+    assert read_rows(output) == read_rows(str(tmp_path / "first.jsonl"))
+    assert os.path.getsize(path + ".idx")
+
+def test_reextract_ignores_a_torn_tail(tmp_path):
+    path = str(tmp_path / "crawl.warc.gz")
+    articles = crawl_archive(path)
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00torn")
+    with WarcArchive(path) as archive:
+        last = archive.entries(latest=False)[-1]
+    with open(path, "rb+") as f:
+        f.truncate(int(last["offset"]) + 10)
+    written, errors = reextract(path, str(tmp_path / "rows.jsonl"), workers=1)
+    assert (written, errors) == (articles, 0)  # the torn article keeps its listing row
+    assert sum(1 for row in read_rows(str(tmp_path / "rows.jsonl")) if row["text"]) == articles - 1
+
+def test_reextract_flags_duplicates_in_the_output(tmp_path):
+    path = str(tmp_path / "crawl.warc.gz")
+    articles = crawl_archive(path)  # three fixture articles served round-robin
+    output = str(tmp_path / "rows.csv")
+    assert reextract(path, output, workers=1, dedup=NearDuplicateIndex()) == (articles, 0)
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert sum(1 for row in rows if row["duplicate_of"]) == articles - 3
+    assert all(float(row["similarity"]) >= 0.8 for row in rows if row["duplicate_of"])
@@ -0,0 +1,63 @@
+import os
+import time
+import pytest
+from scheduler import ScrapeScheduler
+
+def script(tmp_path, body):
+    path = tmp_path / "scraper.py"
+    path.write_text("import sys\n" + body)
+    return str(path)
+
+def test_failures_back_off_exponentially_up_to_the_interval(tmp_path):
+    scheduler = ScrapeScheduler(script(tmp_path, "sys.exit(1)\n"), str(tmp_path / "snapshots"), interval=300,
+                                retry_delay=60)
+    delays = []
+    for _ in range(5):
+        assert not scheduler.refresh()
+        status = scheduler.status()
+        delays.append(round(status["next_attempt_at"] - status["last_finished"]))
+    assert delays == [60, 120, 240, 300, 300]
+    assert 290 < scheduler._delay() <= 300
+    assert scheduler.status()["consecutive_failures"] == 5
+
+def test_success_resets_the_backoff(tmp_path):
+    body = "open(sys.argv[sys.argv.index('--output') + 1], 'w').write('Nom\\n')\n"
+    scheduler = ScrapeScheduler(script(tmp_path, body), str(tmp_path / "snapshots"), interval=300, retry_delay=60)
+    scheduler._status["consecutive_failures"] = 3
+    assert scheduler.refresh()
+    assert scheduler.status()["consecutive_failures"] == 0
+    assert scheduler.status()["next_attempt_at"] is None
+    assert 0 < scheduler._delay() <= 300
+    assert os.path.basename(scheduler.latest()).startswith("doctolib-")
+
+def test_trigger_without_loop_runs_once(tmp_path):
+    body = "open(sys.argv[sys.argv.index('--output') + 1], 'w').write('Nom\\n')\n"
+    scheduler = ScrapeScheduler(script(tmp_path, body), str(tmp_path / "snapshots"))
+    scheduler.trigger()
+    for _ in range(100):
+        if scheduler.latest():
+            break
+        time.sleep(0.05)
+    assert scheduler.latest() is not None
+    assert scheduler._thread is None
+
+def wait_for_runs(scheduler, runs):
+    for _ in range(100):
+        if scheduler.status()["runs"] >= runs and scheduler.status()["state"] == "idle":
+            return
+        time.sleep(0.05)
+
+@pytest.mark.parametrize("loop", [False, True])
+def test_triggers_during_the_backoff_are_dropped(tmp_path, loop):
+    scheduler = ScrapeScheduler(script(tmp_path, "sys.exit(1)\n"), str(tmp_path / "snapshots"), retry_delay=60)
+    if loop:
+        scheduler.start()
+    else:
+        scheduler.trigger()
+    wait_for_runs(scheduler, 1)
+    for _ in range(20):
+        scheduler.trigger()
+        time.sleep(0.01)
+    time.sleep(0.3)
+    assert scheduler.status()["runs"] == 1
+    assert scheduler.status()["consecutive_failures"] == 1
@@ -0,0 +1,33 @@
+import csv
+import json
+import pytest
+from sinks import open_sink
+
+def write(path, records, mode="a", **kwargs):
+    with open_sink(str(path), ["url", "title"], mode=mode, **kwargs) as sink:
+        for record in records:
+            sink.write(record)
+
+@pytest.mark.parametrize("tail", [b'{"url": "/torn', b"x" * (200 * 1024)])
+def test_jsonl_torn_tail_is_dropped_on_reopen(tmp_path, tail):
+    path = tmp_path / "out.jsonl"
+    write(path, [{"url": "/a/", "title": "A"}, {"url": "/b/", "title": "B"}])
+    with open(path, "ab") as f:
+        f.write(tail)
+    write(path, [{"url": "/c/", "title": "C"}])
+    assert [json.loads(line)["url"] for line in open(path, encoding="utf-8")] == ["/a/", "/b/", "/c/"]
+
+def test_jsonl_without_any_newline_is_emptied(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"url": "/torn')
+    write(path, [{"url": "/a/", "title": "A"}])
+    assert [json.loads(line)["url"] for line in open(path, encoding="utf-8")] == ["/a/"]
+
+@pytest.mark.parametrize("name", ["out.csv", "out.jsonl"])
+def test_write_mode_replaces_the_previous_run(tmp_path, name):
+    path = tmp_path / name
+    write(path, [{"url": "/a/", "title": "A"}, {"url": "/b/", "title": "B"}])
+    write(path, [{"url": "/c/", "title": "C"}], mode="w")
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f)) if name.endswith(".csv") else [json.loads(line) for line in f]
+    assert [row["url"] for row in rows] == ["/c/"]